@@ -0,0 +1,70 @@
+import pandas as pd
+import numpy as np
+
+CUBE_KEYS = ['region', 'year', 'month']
+
+def build_aggregate_cube(df, value_col='unemployment_rate', keys=CUBE_KEYS):
+    """Aggregate count/sum/sum-of-squares/min/max over the (region, year, month) grain in one pass"""
+    keys = [key for key in keys if key in df.columns]
+    values = df[value_col].to_numpy(dtype=np.float64)
+    grouped = pd.DataFrame({key: df[key] for key in keys}).assign(value=values, square=values * values)
+
+    cube = grouped.groupby(keys, observed=True, sort=True).agg(
+        count=('value', 'count'),
+        sum=('value', 'sum'),
+        sumsq=('square', 'sum'),
+        min=('value', 'min'),
+        max=('value', 'max')
+    )
+    return cube
+
+def rollup(cube, by=None):
+    """Combine cube cells to a coarser grain (by=None gives the grand total as a Series)"""
+    if by is None:
+        return pd.Series({
+            'count': cube['count'].sum(),
+            'sum': cube['sum'].sum(),
+            'sumsq': cube['sumsq'].sum(),
+            'min': cube['min'].min(),
+            'max': cube['max'].max()
+        })
+    grouped = cube.groupby(level=by, observed=True, sort=True)
+    return grouped.agg({'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'})
+
+def _mean(totals):
+    return totals['sum'] / totals['count']
+
+def _std(totals, ddof=1):
+    count = totals['count']
+    variance = (totals['sumsq'] - totals['sum'] ** 2 / count) / (count - ddof)
+    return np.sqrt(np.maximum(variance, 0))
+
+def cube_mean(cube, by=None):
+    """Mean of the value at the requested grain"""
+    return _mean(rollup(cube, by))
+
+def cube_std(cube, by=None, ddof=1):
+    """Sample standard deviation of the value at the requested grain"""
+    return _std(rollup(cube, by), ddof)
+
+def cube_min(cube, by=None):
+    """Minimum of the value at the requested grain"""
+    return rollup(cube, by)['min']
+
+def cube_max(cube, by=None):
+    """Maximum of the value at the requested grain"""
+    return rollup(cube, by)['max']
+
+def cube_stats(cube, by):
+    """Mean, std, min and max at the requested grain"""
+    totals = rollup(cube, by)
+    return pd.DataFrame({
+        'mean': _mean(totals),
+        'std': _std(totals),
+        'min': totals['min'],
+        'max': totals['max']
+    })
+
+def cube_pivot(cube, index, columns):
+    """Mean value pivoted into an index x columns table"""
+    return cube_mean(cube, [index, columns]).unstack(columns)
@@ -0,0 +1,200 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+BATCH_OUTPUT_DIR = os.path.join('output', 'batch')
+TABLE_NAME = 'comparison'
+
+def collect_inputs(patterns=(), manifest=None):
+    """Input jobs from glob patterns and/or a manifest file
+
+    A manifest is either a CSV with a 'path' column (and optionally 'name')
+    or a plain list of paths, one per line. Returns [{'name', 'path'}] with
+    names unique, so each job gets its own output directory.
+    """
+    entries = []
+    if manifest:
+        with open(manifest) as f:
+            first_line = f.readline().strip()
+        if first_line.split(',')[0] in ('path', 'name'):
+            listed = pd.read_csv(manifest)
+            names = listed['name'] if 'name' in listed.columns else [None] * len(listed)
+            entries.extend(zip(names, listed['path']))
+        else:
+            with open(manifest) as f:
+                entries.extend((None, line.strip()) for line in f if line.strip() and not line.startswith('#'))
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            logger.warning(f"Warning: no files match {pattern}")
+        entries.extend((None, path) for path in matches)
+
+    jobs, seen = [], {}
+    for name, path in entries:
+        name = name if isinstance(name, str) and name else os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        jobs.append({'name': name if count == 0 else f"{name}_{count}", 'path': path})
+    return jobs
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    import main  # Pay for the pipeline imports once per worker, not once per job
+
+def run_job(job, output_dir, main_args=()):
+    """Run the full analysis for one input file into its own output directory
+
+    Never raises: failures are reported in the returned record.
+    """
+    import main
+    started = time.perf_counter()
+    job_dir = os.path.join(output_dir, job['name'])
+    record = {'job': job['name'], 'path': job['path'], 'output_dir': job_dir}
+    try:
+        # main() falls back to sample data for missing files; a batch job must not
+        if not os.path.exists(job['path']):
+            raise FileNotFoundError(f"Input file not found: {job['path']}")
+        # Each job gets its own stage cache and saved states, so concurrent
+        # jobs never share, overwrite or evict each other's entries; they are
+        # removed with the job rather than duplicating its data on disk
+        with tempfile.TemporaryDirectory(prefix='unemployment-batch-') as cache_dir:
+            outputs = main.main(['--data', job['path'], '--output-dir', job_dir, '--quiet',
+                                 '--cache-dir', cache_dir, *main_args])
+        results = main.numbers_report(outputs)
+        with open(os.path.join(job_dir, 'results.json'), 'w') as f:
+            json.dump(results, f, indent=2, allow_nan=False)
+        record.update(status='ok', results=results)
+    except (Exception, SystemExit) as e:
+        record.update(status='failed', error=f"{type(e).__name__}: {e}")
+    record['seconds'] = time.perf_counter() - started
+    return record
+
+def comparison_table(records):
+    """One row per job with every scalar result flattened to a column
+
+    Columns are named '<stage>.<key>' (e.g. 'covid.covid_increase_pct');
+    list-valued results such as per-event tables stay in each job's
+    results.json.
+    """
+    rows = []
+    for record in records:
+        row = {key: record.get(key) for key in ('job', 'path', 'status', 'error', 'seconds')}
+        row.update(pd.json_normalize(record.get('results') or {}, sep='.').iloc[0].to_dict()
+                   if record.get('results') else {})
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    scalar = [col for col in table.columns
+              if not table[col].map(lambda value: isinstance(value, (list, dict))).any()]
+    return table[scalar]
+
+def write_table(table, path):
+    """Write the comparison table as Parquet (when pyarrow is installed) or CSV"""
+    if path.endswith('.parquet'):
+        if importlib.util.find_spec('pyarrow') is not None:
+            table.to_parquet(path, index=False)
+            return path
+        path = path[:-len('.parquet')] + '.csv'
+        logger.info("pyarrow is not installed; writing the comparison table as CSV")
+    table.to_csv(path, index=False)
+    return path
+
+def _died(job, error):
+    return {'job': job['name'], 'path': job['path'], 'status': 'failed',
+            'error': f"Worker process died: {error}", 'seconds': None}
+
+def _run_isolated(job, output_dir, main_args):
+    """Run one job in a process of its own, so a crash fails only that job"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker) as executor:
+        try:
+            return executor.submit(run_job, job, output_dir, main_args).result()
+        except BrokenProcessPool as e:
+            return _died(job, e)
+
+def run_batch(jobs, output_dir=BATCH_OUTPUT_DIR, workers=None, main_args=()):
+    """Fan jobs out over a process pool and return their records in job order
+
+    A worker that dies (e.g. killed for memory) breaks the shared pool and
+    every job still pending in it. Those jobs are rerun one process each,
+    so only the job that kills its own process is recorded as failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    main_args = tuple(main_args)
+    records = {}
+    unfinished = []
+
+    def finish(job, record):
+        records[job['name']] = record
+        detail = f"{record['seconds']:.1f}s" if record['status'] == 'ok' else record['error']
+        logger.info(f"[{len(records)}/{len(jobs)}] {record['job']}: {record['status']} ({detail})")
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor:
+        futures = {executor.submit(run_job, job, output_dir, main_args): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                finish(job, future.result())
+            except BrokenProcessPool:
+                unfinished.append(job)
+
+    if unfinished:
+        logger.warning(f"A worker process died; rerunning {len(unfinished)} unfinished jobs in separate processes")
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            retries = {executor.submit(_run_isolated, job, output_dir, main_args): job for job in unfinished}
+            for future in as_completed(retries):
+                finish(retries[future], future.result())
+    return [records[job['name']] for job in jobs]
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Run the unemployment analysis over many input files')
+    parser.add_argument('inputs', nargs='*', help='Input CSV files or glob patterns')
+    parser.add_argument('--manifest', help="File listing inputs: one path per line, or a CSV with 'path' and 'name'")
+    parser.add_argument('--output-dir', default=BATCH_OUTPUT_DIR, help='Parent directory of the per-job outputs')
+    parser.add_argument('--workers', type=int, default=None, help='Number of job processes (default: CPU count)')
+    parser.add_argument('--render', choices=['inline', 'none'], default='inline',
+                        help="Draw each job's figures in its worker, or skip them")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Comparison table format')
+    parser.add_argument('--no-cache', action='store_true', help="Neither read nor write the jobs' temporary stage caches")
+    parser.add_argument('--quiet', action='store_true', help='Silence progress output')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run every job and write the comparison table; exit status 1 if any job failed"""
+    args = parse_args(argv)
+    configure_logging(quiet=args.quiet)
+    jobs = collect_inputs(args.inputs, args.manifest)
+    if not jobs:
+        raise SystemExit("No input files given")
+
+    # Jobs already run in parallel, so each one runs its stages serially
+    main_args = ['--render', args.render, '--jobs', '1'] + (['--no-cache'] if args.no_cache else [])
+    logger.info(f"Running {len(jobs)} jobs into {args.output_dir}")
+    started = time.perf_counter()
+    records = run_batch(jobs, args.output_dir, args.workers, main_args)
+
+    table_path = write_table(comparison_table(records),
+                             os.path.join(args.output_dir, f"{TABLE_NAME}.{args.format}"))
+    failed = [record for record in records if record['status'] != 'ok']
+    logger.info(f"\n{len(records) - len(failed)} of {len(records)} jobs succeeded in "
+                f"{time.perf_counter() - started:.1f}s; comparison table written to {table_path}")
+    for record in failed:
+        logger.info(f"   - {record['job']}: {record['error']}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
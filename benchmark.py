@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import queue as queue_module
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+import numpy as np
+from instrumentation import rss_mb, peak_rss_mb
+
+N_MONTHS = 180
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+RESULTS_PATH = 'benchmark_results.json'
+DEFAULT_TOLERANCE = 0.25
+# How often a waiting parent checks that its benchmark child is still alive
+RESULT_POLL_SECONDS = 1.0
+
+# Cold-start budget for importing the entry point; the numbers-only path must
+# not pull in the plotting or statsmodels stacks
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'statsmodels']
+# Largest difference allowed between decompose_panel and the statsmodels reference
+DECOMPOSITION_TOLERANCE = 1e-8
+
+# Each stage is (setup, run, plots): setup(csv_path) prepares the inputs outside
+# the timed region, run(inputs) executes the stage being measured and plots
+# says whether the stage draws figures when rendering is enabled
+def _setup_none(csv_path):
+    return csv_path
+
+def _setup_raw(csv_path):
+    from data_loader import load_real_data
+    return load_real_data(csv_path)
+
+def _setup_clean(csv_path):
+    from data_cleaner import clean_unemployment_data
+    return clean_unemployment_data(_setup_raw(csv_path))
+
+def _setup_enhanced(csv_path):
+    from data_cleaner import add_derived_features
+    return add_derived_features(_setup_clean(csv_path))
+
+def _setup_policy(csv_path):
+    from covid_impact import analyze_covid_impact
+    from seasonal_analysis import analyze_seasonal_patterns
+    df = _setup_enhanced(csv_path)
+    return df, analyze_covid_impact(df), analyze_seasonal_patterns(df)
+
+def _run_load(csv_path):
+    from data_loader import load_real_data
+    return load_real_data(csv_path)
+
+def _run_load_streaming(csv_path):
+    from data_loader import load_real_data_streaming
+    return load_real_data_streaming(csv_path)
+
+def _run_clean(df):
+    from data_cleaner import clean_unemployment_data
+    return clean_unemployment_data(df)
+
+def _run_clean_lean(df):
+    from data_cleaner import clean_unemployment_data, add_derived_features
+    return add_derived_features(clean_unemployment_data(df, lean=True), copy=False)
+
+def _run_enhance(df):
+    from data_cleaner import add_derived_features
+    return add_derived_features(df)
+
+def _run_statistics(df):
+    from exploratory_analysis import calculate_basic_statistics
+    return calculate_basic_statistics(df)
+
+def _run_statistics_sketch(df):
+    from exploratory_analysis import calculate_basic_statistics
+    return calculate_basic_statistics(df, backend='sketch')
+
+def _run_overview(df):
+    from exploratory_analysis import plot_overview
+    return plot_overview(df)
+
+def _run_covid(df):
+    from covid_impact import analyze_covid_impact
+    return analyze_covid_impact(df)
+
+def _run_seasonal(df):
+    from seasonal_analysis import analyze_seasonal_patterns
+    return analyze_seasonal_patterns(df)
+
+def _run_policy(inputs):
+    from policy_insights import generate_policy_insights
+    return generate_policy_insights(*inputs)
+
+def _run_main(csv_path):
+    from main import main
+    from rendering import RENDER_SETTINGS
+    main(['--data', csv_path, '--no-cache', '--render', RENDER_SETTINGS['mode'],
+          '--output-dir', RENDER_SETTINGS['output_dir']])
+
+STAGES = {
+    'load': (_setup_none, _run_load, False),
+    'load_streaming': (_setup_none, _run_load_streaming, False),
+    'clean': (_setup_raw, _run_clean, False),
+    'clean_lean': (_setup_raw, _run_clean_lean, False),
+    'enhance': (_setup_clean, _run_enhance, False),
+    'statistics': (_setup_enhanced, _run_statistics, False),
+    'statistics_sketch': (_setup_enhanced, _run_statistics_sketch, False),
+    'overview': (_setup_enhanced, _run_overview, True),
+    'covid': (_setup_enhanced, _run_covid, True),
+    'seasonal': (_setup_enhanced, _run_seasonal, True),
+    'policy': (_setup_policy, _run_policy, True),
+    'main': (_setup_none, _run_main, True)
+}
+
+def _measure(stage, csv_path, plots, output_dir, queue):
+    """Child process body: set up, time one stage and report its measurements"""
+    import main  # Import every pipeline module up front so imports are not timed
+    # main keeps statsmodels out of its imports; a stage that still loads it
+    # lazily (e.g. the statsmodels reference check) must not time the import
+    import statsmodels.tsa.seasonal
+    if plots:
+        import matplotlib.pyplot
+        import seaborn
+    from rendering import configure_rendering
+    configure_rendering(mode='inline' if plots else 'none', output_dir=output_dir)
+    if stage == 'main' and plots:
+        configure_rendering(mode='pool')
+
+    setup, run, _ = STAGES[stage]
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            inputs = setup(csv_path)
+            rss_before = rss_mb()
+            started = time.perf_counter()
+            run(inputs)
+            seconds = time.perf_counter() - started
+        queue.put({'seconds': seconds, 'rss_before_mb': rss_before, 'peak_rss_mb': peak_rss_mb()})
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+def _wait_for_result(process, queue, poll_seconds=RESULT_POLL_SECONDS):
+    """The child's measurements, or an error if it died without reporting (e.g. killed for memory)"""
+    while True:
+        try:
+            return queue.get(timeout=poll_seconds)
+        except queue_module.Empty:
+            if process.is_alive():
+                continue
+        # The child may have exited just after putting its result
+        try:
+            return queue.get(timeout=poll_seconds)
+        except queue_module.Empty:
+            process.join()
+            return {'error': f"Benchmark process died with exit code {process.exitcode}"}
+
+def run_case(stage, csv_path, rows, plots, output_dir, repeat=1):
+    """Run one (stage, size, plots) case in fresh processes; keep the fastest repeat"""
+    context = multiprocessing.get_context('spawn')
+    best = None
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(stage, csv_path, plots, output_dir, queue))
+        process.start()
+        result = _wait_for_result(process, queue)
+        process.join()
+        if 'error' in result:
+            best = result
+            break
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+
+    best.update({'stage': stage, 'rows': rows, 'plots': plots})
+    if 'seconds' in best:
+        best['rows_per_sec'] = rows / best['seconds'] if best['seconds'] > 0 else None
+    return best
+
+def prepare_dataset(directory, size, seed=0):
+    """Write a synthetic panel of about size rows and return (path, rows)"""
+    from data_loader import write_sample_data
+    n_regions = max(1, int(round(size / N_MONTHS)))
+    csv_path = os.path.join(directory, f"bench_{size}.csv")
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows = write_sample_data(csv_path, n_regions, n_months=N_MONTHS, seed=seed)
+    return csv_path, rows
+
+def measure_import_time(module='main', repeat=5):
+    """Fastest cold import time of module in fresh interpreters, and any heavy modules it loaded"""
+    script = (
+        "import sys, time, json\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - started\n"
+        f"print(json.dumps([seconds, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = None, []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], cwd=here, check=True,
+                                capture_output=True, text=True).stdout
+        seconds, heavy = json.loads(output.strip().splitlines()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best, heavy
+
+def check_import_budget(budget=IMPORT_BUDGET_SECONDS, module='main'):
+    """Measure module's import against budget; 'ok' is False if it is slower or loads heavy dependencies"""
+    seconds, heavy = measure_import_time(module)
+    within = seconds <= budget and not heavy
+    print(f"import {module}: {seconds:.3f}s (budget {budget:.3f}s)"
+          + (f", loaded {', '.join(heavy)}" if heavy else "")
+          + (" OK" if within else " OVER BUDGET"))
+    return {'module': module, 'seconds': seconds, 'budget': budget, 'heavy': heavy, 'ok': within}
+
+def check_decomposition(n_regions=20, tolerance=DECOMPOSITION_TOLERANCE):
+    """Return True if the panel decomposition matches statsmodels on a generated panel"""
+    from data_loader import generate_sample_data
+    from seasonal_analysis import reference_check
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        df = generate_sample_data(n_regions, seed=0)
+    worst = reference_check(df)
+    within = max(worst.values()) <= tolerance
+    print("decompose_panel vs statsmodels, largest difference: "
+          + ", ".join(f"{key} {value:.1e}" for key, value in worst.items())
+          + (" OK" if within else " MISMATCH"))
+    return within
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the cases whose wall time regressed by more than tolerance"""
+    reference = {(r['stage'], r['rows'], r['plots']): r for r in baseline['results'] if 'seconds' in r}
+    regressions = []
+    for result in results:
+        base = reference.get((result['stage'], result['rows'], result['plots']))
+        if base is None or 'seconds' not in result:
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] > 0 else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append({**result, 'baseline_seconds': base['seconds'], 'ratio': ratio})
+    return regressions
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=None, plots=(False, True), repeat=1, seed=0):
+    """Run every requested stage at every size, with plotting off and/or on"""
+    stages = stages or list(STAGES)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='unemployment-bench-') as directory:
+        output_dir = os.path.join(directory, 'output')
+        for size in sizes:
+            csv_path, rows = prepare_dataset(directory, size, seed)
+            for stage in stages:
+                for plot in plots:
+                    if plot and not STAGES[stage][2]:
+                        continue
+                    result = run_case(stage, csv_path, rows, plot, output_dir, repeat)
+                    results.append(result)
+                    label = f"{stage}{' +plots' if plot else ''}"
+                    if 'error' in result:
+                        print(f"{label:<24} {rows:>12,} rows  ERROR {result['error']}")
+                    else:
+                        peak = result['peak_rss_mb']
+                        print(f"{label:<24} {rows:>12,} rows  {result['seconds']:9.3f}s  "
+                              f"{result['rows_per_sec'] or 0:>14,.0f} rows/s  "
+                              f"peak RSS {peak if peak is not None else float('nan'):8.1f} MB")
+    return results
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Benchmark the unemployment analysis pipeline stages')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES,
+                        help='Approximate row counts to benchmark (e.g. 1e3 1e5 1e7)')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help='Stages to run (default: all)')
+    parser.add_argument('--plots', choices=['off', 'on', 'both'], default='both',
+                        help='Run plotting stages with rendering disabled, enabled or both')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept')
+    parser.add_argument('--output', default=RESULTS_PATH, help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--import-budget', type=float, nargs='?', const=IMPORT_BUDGET_SECONDS,
+                        help='Only check that importing main.py stays within this many seconds '
+                             'without loading the plotting or statsmodels stacks (every run checks '
+                             f'the default {IMPORT_BUDGET_SECONDS}s budget)')
+    parser.add_argument('--check-decomposition', action='store_true',
+                        help='Only check the panel decomposition against statsmodels')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown before a case is flagged (0.25 = 25%%)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the benchmark suite and flag regressions against a baseline"""
+    args = parse_args(argv)
+    if args.import_budget is not None:
+        return 0 if check_import_budget(args.import_budget)['ok'] else 1
+    if args.check_decomposition:
+        return 0 if check_decomposition() else 1
+
+    # A slow or heavy import of main fails the run like a stage regression
+    import_check = check_import_budget()
+    plots = {'off': (False,), 'on': (True,), 'both': (False, True)}[args.plots]
+    results = run_benchmarks([int(size) for size in args.sizes], args.stages, plots, args.repeat)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'import': import_check,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if not import_check['ok']:
+        return 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']}{' +plots' if r['plots'] else ''} at {r['rows']:,} rows: "
+                  f"{r['seconds']:.3f}s vs {r['baseline_seconds']:.3f}s ({r['ratio']:.2f}x)")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
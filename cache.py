@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import pandas as pd
+import numpy as np
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = '.cache'
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+META_FILE = 'meta.json'
+
+def file_fingerprint(file_path, block_size=1 << 20):
+    """Hash the contents of a source file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stage_key(parent_key, stage, version, params=None):
+    """Derive the cache key of a stage from its input key, code version and parameters"""
+    payload = json.dumps([parent_key, stage, str(version), params or {}], sort_keys=True, default=str)
+    return f"{stage}-{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+def write_frame(df, directory):
+    """Write a DataFrame as one .npy file per column plus a JSON schema"""
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        entry = {'name': name, 'file': f"col{i}.npy", 'dtype': str(series.dtype)}
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            # Stored as the underlying instants; the zone and unit go in the schema
+            values = series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+            entry['timezone'] = str(series.dt.tz)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy()
+            entry['categories'] = series.cat.categories.tolist()
+            entry['ordered'] = bool(series.cat.ordered)
+        elif series.dtype.kind in 'biufcmM' and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            values = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series)
+            values = codes
+            entry['categories'] = uniques.tolist()
+        np.save(os.path.join(directory, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+
+    meta = {'columns': columns, 'rows': len(df), 'created': time.time()}
+    with open(os.path.join(directory, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+def read_frame(directory, mmap=True):
+    """Read a DataFrame written by write_frame, memory-mapping numeric columns"""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r' if mmap else None)
+        if 'timezone' in entry:
+            values = pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(entry['timezone'])
+        elif 'categories' in entry:
+            column = pd.Categorical.from_codes(values, entry['categories'], ordered=entry.get('ordered', False))
+            if entry['dtype'] != 'category':
+                column = pd.Series(column).astype(entry['dtype']).to_numpy()
+            values = column
+        data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+def _entry_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Remove least recently used entries until the cache fits in max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        meta_path = os.path.join(entry.path, META_FILE)
+        if entry.is_dir() and os.path.exists(meta_path):
+            entries.append((os.path.getmtime(meta_path), _entry_size(entry.path), entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted.append(os.path.basename(path))
+    return evicted
+
+def contains(key, cache_dir=CACHE_DIR):
+    """Whether key has a complete cache entry"""
+    return os.path.exists(os.path.join(cache_dir, key, META_FILE))
+
+def lookup(key, cache_dir=CACHE_DIR):
+    """Return the cached frame for key, or None on a miss"""
+    directory = os.path.join(cache_dir, key)
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    os.utime(meta_path)  # Mark as recently used for eviction
+    return read_frame(directory)
+
+def store(key, df, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Store a frame under key and apply size-bounded eviction"""
+    directory = os.path.join(cache_dir, key)
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    write_frame(df, staging)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    evict(cache_dir, max_bytes)
+
+def cached_stage(key, build, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, rebuild=False):
+    """Load a stage output from the cache, building and storing it on a miss"""
+    if not rebuild:
+        started = time.perf_counter()
+        df = lookup(key, cache_dir)
+        if df is not None:
+            logger.info(f"Loaded {key} from cache in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return df
+
+    df = build()
+    store(key, df, cache_dir, max_bytes)
+    return df
@@ -1,47 +1,33 @@
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+from event_windows import DEFAULT_EVENTS, event_metrics, sorted_by_date, window_slice
+from downsample import downsample
+from rendering import RENDER_SETTINGS, make_spec, render
+from instrumentation import get_logger
 
-def analyze_covid_impact(df):
-    """Analyze the impact of COVID-19 on unemployment"""
-    print("Analyzing COVID-19 impact...")
-    
-    # Define periods
-    pre_covid = df[df['date'] < '2020-03-01']
-    covid_period = df[(df['date'] >= '2020-03-01') & (df['date'] <= '2021-12-01')]
-    post_covid = df[df['date'] > '2021-12-01']
-    
-    # Calculate metrics
-    max_covid_rate = covid_period['unemployment_rate'].max()
-    pre_covid_avg = pre_covid[pre_covid['date'] >= '2019-01-01']['unemployment_rate'].mean()
-    covid_increase = ((max_covid_rate - pre_covid_avg) / pre_covid_avg) * 100
+logger = get_logger(__name__)
+
+def draw_covid_impact(data):
+    """Draw the COVID-19 impact figure from its spec data"""
+    import matplotlib.pyplot as plt
     
-    # Create visualization
     fig, axes = plt.subplots(1, 2, figsize=(15, 6))
     fig.suptitle('COVID-19 Impact on Unemployment', fontsize=16, fontweight='bold')
     
     # Period comparison
-    periods = ['Pre-COVID', 'COVID Period', 'Post-COVID']
-    averages = [
-        pre_covid['unemployment_rate'].mean(),
-        covid_period['unemployment_rate'].mean(),
-        post_covid['unemployment_rate'].mean()
-    ]
-    
-    bars = axes[0].bar(periods, averages, color=['blue', 'red', 'green'], alpha=0.7)
+    bars = axes[0].bar(data['periods'], data['averages'], color=['blue', 'red', 'green'], alpha=0.7)
     axes[0].set_title('Average Unemployment Rate by Period')
     axes[0].set_ylabel('Unemployment Rate (%)')
     
     # Add value labels on bars
-    for bar, value in zip(bars, averages):
+    for bar, value in zip(bars, data['averages']):
         axes[0].text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
                     f'{value:.2f}%', ha='center', va='bottom')
     
     # Detailed COVID timeline
-    covid_extended = df[(df['date'] >= '2019-01-01') & (df['date'] <= '2022-12-01')]
-    axes[1].plot(covid_extended['date'], covid_extended['unemployment_rate'], 
+    axes[1].plot(data['timeline_dates'], data['timeline_rates'], 
                 linewidth=2, color='crimson')
-    axes[1].fill_between(covid_extended['date'], covid_extended['unemployment_rate'],
+    axes[1].fill_between(data['timeline_dates'], data['timeline_rates'],
                         alpha=0.3, color='red')
     axes[1].set_title('COVID-19 Impact Timeline (2019-2022)')
     axes[1].set_xlabel('Date')
@@ -50,23 +36,61 @@ def analyze_covid_impact(df):
     axes[1].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('output/covid_impact.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
+
+def analyze_covid_impact(df, events=None):
+    """Analyze the impact of COVID-19 on unemployment"""
+    logger.info("Analyzing COVID-19 impact...")
+    
+    # Define periods by binary search on the sorted dates
+    df = sorted_by_date(df)
+    dates = df['date'].to_numpy()
+    pre_covid = df.iloc[window_slice(dates, end='2020-03-01', inclusive='left')]
+    covid_period = df.iloc[window_slice(dates, '2020-03-01', '2021-12-01')]
+    post_covid = df.iloc[window_slice(dates, start='2021-12-01', inclusive='neither')]
+    
+    # Calculate metrics
+    max_covid_rate = covid_period['unemployment_rate'].max()
+    pre_covid_avg = df.iloc[window_slice(dates, '2019-01-01', '2020-03-01', inclusive='left')]['unemployment_rate'].mean()
+    covid_increase = ((max_covid_rate - pre_covid_avg) / pre_covid_avg) * 100
+    
+    # Create visualization
+    periods = ['Pre-COVID', 'COVID Period', 'Post-COVID']
+    averages = [
+        pre_covid['unemployment_rate'].mean(),
+        covid_period['unemployment_rate'].mean(),
+        post_covid['unemployment_rate'].mean()
+    ]
+    covid_extended = df.iloc[window_slice(dates, '2019-01-01', '2022-12-01')]
+    timeline_dates, timeline_rates = downsample(covid_extended['date'].to_numpy(),
+                                                covid_extended['unemployment_rate'].to_numpy(),
+                                                RENDER_SETTINGS['point_budget'])
+    render(make_spec(
+        'covid_impact', 'covid_impact:draw_covid_impact',
+        periods=periods,
+        averages=averages,
+        timeline_dates=timeline_dates,
+        timeline_rates=timeline_rates
+    ))
     
     # Print findings
-    print("\n" + "="*50)
-    print("COVID-19 IMPACT FINDINGS")
-    print("="*50)
-    print(f"Pre-COVID Average (2019-2020): {pre_covid_avg:.2f}%")
-    print(f"Peak COVID Rate: {max_covid_rate:.2f}%")
-    print(f"Maximum Increase: {covid_increase:.1f}%")
-    print(f"COVID Period Average: {covid_period['unemployment_rate'].mean():.2f}%")
-    print(f"Post-COVID Average: {post_covid['unemployment_rate'].mean():.2f}%")
+    logger.info("\n" + "="*50)
+    logger.info("COVID-19 IMPACT FINDINGS")
+    logger.info("="*50)
+    logger.info(f"Pre-COVID Average (2019-2020): {pre_covid_avg:.2f}%")
+    logger.info(f"Peak COVID Rate: {max_covid_rate:.2f}%")
+    logger.info(f"Maximum Increase: {covid_increase:.1f}%")
+    logger.info(f"COVID Period Average: {covid_period['unemployment_rate'].mean():.2f}%")
+    logger.info(f"Post-COVID Average: {post_covid['unemployment_rate'].mean():.2f}%")
+    
+    # Same metrics for every event x region
+    event_impact = event_metrics(df, events or DEFAULT_EVENTS)
     
     return {
         'pre_covid_avg': pre_covid_avg,
         'peak_covid_rate': max_covid_rate,
         'covid_increase_pct': covid_increase,
         'covid_period_avg': covid_period['unemployment_rate'].mean(),
-        'post_covid_avg': post_covid['unemployment_rate'].mean()
+        'post_covid_avg': post_covid['unemployment_rate'].mean(),
+        'event_impact': event_impact
     }
\ No newline at end of file
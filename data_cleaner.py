@@ -1,9 +1,82 @@
 import pandas as pd
 import numpy as np
+from data_loader import CSV_SCHEMA
+from instrumentation import get_logger
 
-def clean_unemployment_data(df):
-    """Clean and validate unemployment data"""
-    print("Cleaning unemployment data...")
+logger = get_logger(__name__)
+
+# Bump when the stage logic changes so cached outputs are rebuilt
+CLEAN_VERSION = 1
+FEATURES_VERSION = 2
+
+DERIVED_COLUMNS = ['yoy_change', 'monthly_change', 'rolling_3mo', 'rolling_12mo']
+
+def frame_memory_mb(df):
+    """Memory held by a DataFrame, including object column contents, in MB"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def _compact_column(series, dtype):
+    """Downcast a column to the schema dtype when its values fit"""
+    if str(series.dtype) == dtype:
+        return series
+    if dtype.startswith('int'):
+        if not pd.api.types.is_integer_dtype(series.dtype):
+            return series
+        limits = np.iinfo(dtype)
+        if len(series) and (series.min() < limits.min or series.max() > limits.max):
+            return series
+    return series.astype(dtype)
+
+def _clean_lean(df):
+    """Clean with one validation pass, one row selection and compact dtypes"""
+    before = frame_memory_mb(df)
+    
+    # Missing values, duplicates and the rate range are checked in a single pass
+    # over the input, and all of them feed one row selection
+    missing = df.isna().to_numpy()
+    keep = ~missing.any(axis=1)
+    missing_values = int(missing.sum())
+    del missing
+    if missing_values > 0:
+        logger.info(f"Found {missing_values} missing values. Handling them...")
+    
+    # A row that duplicates a complete row is complete itself, so counting over
+    # the whole frame matches counting after dropping incomplete rows
+    duplicated = df.duplicated().to_numpy() & keep
+    duplicates = int(duplicated.sum())
+    if duplicates > 0:
+        logger.info(f"Found {duplicates} duplicate rows. Removing them...")
+    keep &= ~duplicated
+    
+    rates = df['unemployment_rate'].to_numpy()[keep]
+    if len(rates) and (rates.min() < 0 or rates.max() > 50):
+        logger.warning("Warning: Unemployment rates outside expected range (0-50%)")
+    
+    # Kept rows in date order (the same sort as sort_values, so rows with equal
+    # dates keep the standard mode's order); every column is gathered once
+    dates = pd.to_datetime(df['date']).to_numpy()
+    rows = np.flatnonzero(keep)
+    rows = rows[np.argsort(dates[rows], kind='quicksort')]
+    columns = {}
+    for name, series in df.items():
+        column = pd.Series(dates[rows]) if name == 'date' else series.take(rows).reset_index(drop=True)
+        columns[name] = _compact_column(column, CSV_SCHEMA[name]) if name in CSV_SCHEMA else column
+    df_clean = pd.DataFrame(columns)
+    
+    logger.info(f"Memory footprint: {before:.1f} MB -> {frame_memory_mb(df_clean):.1f} MB")
+    logger.info("Data cleaning completed successfully")
+    return df_clean
+
+def clean_unemployment_data(df, lean=False):
+    """Clean and validate unemployment data
+    
+    With lean=True the data is validated in one pass and copied once, with
+    region as a category, year/month/quarter as int16/int8 and the rate as
+    float32; the before/after memory footprint is logged.
+    """
+    logger.info("Cleaning unemployment data...")
+    if lean:
+        return _clean_lean(df)
     
     # Make a copy to avoid modifying original
     df_clean = df.copy()
@@ -11,13 +84,13 @@ def clean_unemployment_data(df):
     # Check for missing values
     missing_values = df_clean.isnull().sum().sum()
     if missing_values > 0:
-        print(f"Found {missing_values} missing values. Handling them...")
+        logger.info(f"Found {missing_values} missing values. Handling them...")
         df_clean = df_clean.dropna()
     
     # Check for duplicates
     duplicates = df_clean.duplicated().sum()
     if duplicates > 0:
-        print(f"Found {duplicates} duplicate rows. Removing them...")
+        logger.info(f"Found {duplicates} duplicate rows. Removing them...")
         df_clean = df_clean.drop_duplicates()
     
     # Validate data ranges
@@ -25,7 +98,7 @@ def clean_unemployment_data(df):
     max_rate = df_clean['unemployment_rate'].max()
     
     if min_rate < 0 or max_rate > 50:
-        print("Warning: Unemployment rates outside expected range (0-50%)")
+        logger.warning("Warning: Unemployment rates outside expected range (0-50%)")
     
     # Ensure date is datetime
     df_clean['date'] = pd.to_datetime(df_clean['date'])
@@ -33,21 +106,75 @@ def clean_unemployment_data(df):
     # Sort by date
     df_clean = df_clean.sort_values('date').reset_index(drop=True)
     
-    print("Data cleaning completed successfully")
+    logger.info("Data cleaning completed successfully")
     return df_clean
 
-def add_derived_features(df):
-    """Add derived features for analysis"""
-    df_enhanced = df.copy()
+def _series_layout(df, group_col):
+    """Sort order by (series, date) plus each sorted row's series start and month ordinal"""
+    dates = pd.DatetimeIndex(df['date'])
+    months = (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+    if group_col in df.columns:
+        codes = pd.factorize(df[group_col], sort=True)[0].astype(np.int64)
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
     
-    # Year-over-year change
-    df_enhanced['yoy_change'] = df_enhanced.groupby('month')['unemployment_rate'].shift(1) - df_enhanced['unemployment_rate']
+    order = np.lexsort((dates.asi8, codes))
+    codes, months = codes[order], months[order]
+    positions = np.arange(len(order))
+    is_start = np.ones(len(order), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    series_start = np.maximum.accumulate(np.where(is_start, positions, 0))
+    return order, codes, months, series_start
+
+def _segment_rolling_mean(values, series_start, window):
+    """Trailing rolling mean that restarts at every series boundary"""
+    positions = np.arange(len(values))
+    valid = ~np.isnan(values)
+    # Centre before the cumulative sum to keep its magnitude (and rounding) small
+    offset = values[valid].mean() if valid.any() else 0.0
+    csum = np.concatenate([[0.0], np.cumsum(np.where(valid, values - offset, 0.0))])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+    
+    lo = positions - window + 1
+    full = lo >= series_start
+    lo = np.maximum(lo, 0)
+    window_sum = csum[positions + 1] - csum[lo]
+    complete = full & (ccount[positions + 1] - ccount[lo] == window)
+    return np.where(complete, window_sum / window + offset, np.nan)
+
+def add_derived_features(df, group_col='region', copy=True):
+    """Add derived features for analysis, computed within each region's own series
+    
+    With copy=False the feature columns are added to df itself. Features are
+    stored in the rate column's float precision (float32 for lean frames).
+    """
+    df_enhanced = df.copy() if copy else df
+    feature_dtype = np.result_type(df_enhanced['unemployment_rate'].dtype, np.float32)
+    
+    order, codes, months, series_start = _series_layout(df_enhanced, group_col)
+    values = df_enhanced['unemployment_rate'].to_numpy(dtype=np.float64)[order]
+    positions = np.arange(len(values))
+    
+    # Year-over-year change: same series, same calendar month one year earlier
+    keys = codes * (months.max(initial=0) + 13) + months
+    prior = np.minimum(np.searchsorted(keys, keys - 12), max(len(keys) - 1, 0))
+    has_prior = (keys[prior] == keys - 12) if len(keys) else np.zeros(0, dtype=bool)
+    yoy_change = np.where(has_prior, values - values[prior], np.nan)
     
     # Monthly change
-    df_enhanced['monthly_change'] = df_enhanced['unemployment_rate'].diff()
+    monthly_change = np.full(len(values), np.nan)
+    within = positions > series_start
+    monthly_change[within] = values[within] - values[positions[within] - 1]
     
     # Rolling averages
-    df_enhanced['rolling_3mo'] = df_enhanced['unemployment_rate'].rolling(window=3).mean()
-    df_enhanced['rolling_12mo'] = df_enhanced['unemployment_rate'].rolling(window=12).mean()
+    rolling_3mo = _segment_rolling_mean(values, series_start, 3)
+    rolling_12mo = _segment_rolling_mean(values, series_start, 12)
+    
+    # Scatter back from (series, date) order to the frame's row order
+    for name, column in [('yoy_change', yoy_change), ('monthly_change', monthly_change),
+                         ('rolling_3mo', rolling_3mo), ('rolling_12mo', rolling_12mo)]:
+        unsorted = np.empty(len(column), dtype=feature_dtype)
+        unsorted[order] = column
+        df_enhanced[name] = unsorted
     
     return df_enhanced
\ No newline at end of file
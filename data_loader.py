@@ -1,54 +1,246 @@
+import time
+import tracemalloc
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from pandas.api.types import union_categoricals
+from instrumentation import get_logger
 
-def generate_sample_data():
-    """Generate synthetic unemployment data with realistic patterns"""
-    print("Generating sample unemployment data...")
+logger = get_logger(__name__)
+
+SAMPLE_REGIONS = ['Northeast', 'Midwest', 'South', 'West']
+
+# Shocks are (start month, monthly increments in percentage points)
+COVID_SHOCK = ('2020-03-01', [8, 12, 10, 6, 4, 2])
+
+def _region_names(n_regions):
+    if n_regions <= len(SAMPLE_REGIONS):
+        return SAMPLE_REGIONS[:n_regions]
+    width = len(str(n_regions - 1))
+    return [f"Region {i:0{width}d}" for i in range(n_regions)]
+
+def _region_parameters(n_regions, seed, vary):
+    """Per-region level offset and trend/seasonal/shock/noise scales"""
+    if not vary:
+        ones = np.ones(n_regions)
+        return {'level': np.zeros(n_regions), 'trend': ones, 'seasonal': ones, 'shock': ones, 'noise': ones}
+    rng = np.random.default_rng([seed, 0])
+    return {
+        'level': rng.normal(0, 1.0, n_regions),
+        'trend': rng.uniform(0.7, 1.3, n_regions),
+        'seasonal': rng.uniform(0.5, 1.5, n_regions),
+        'shock': rng.uniform(0.5, 1.5, n_regions),
+        'noise': rng.uniform(0.5, 1.5, n_regions)
+    }
+
+def _iter_panel_chunks(n_regions, dates, seed, trend, seasonal_amplitude, shocks, noise,
+                       chunk_regions, components, vary):
+    """Yield the panel as DataFrames of chunk_regions complete series each"""
+    n_months = len(dates)
+    months = np.arange(n_months)
+    names = _region_names(n_regions)
+    params = _region_parameters(n_regions, seed, vary)
     
-    dates = pd.date_range('2010-01-01', '2024-12-01', freq='MS')
-    n_periods = len(dates)
+    # Shared component shapes, scaled per region below
+    base_trend = np.linspace(trend[0], trend[1], n_months)
+    seasonal_shape = seasonal_amplitude * np.sin(2 * np.pi * months / 12)
+    shock_shape = np.zeros(n_months)
+    for shock_start, profile in shocks:
+        offset = (pd.Timestamp(shock_start).year - dates[0].year) * 12 + pd.Timestamp(shock_start).month - dates[0].month
+        for i, increment in enumerate(profile):
+            if 0 <= offset + i < n_months:
+                shock_shape[offset + i] += increment
     
-    # Base trend with seasonal patterns
-    base_trend = np.linspace(8.5, 3.8, n_periods)
+    for chunk_index, first in enumerate(range(0, n_regions, chunk_regions)):
+        block = slice(first, min(first + chunk_regions, n_regions))
+        size = block.stop - block.start
+        rng = np.random.default_rng([seed, chunk_index + 1])
+        
+        trend_part = params['trend'][block, None] * base_trend + params['level'][block, None]
+        seasonal_part = params['seasonal'][block, None] * seasonal_shape
+        shock_part = params['shock'][block, None] * shock_shape
+        noise_part = params['noise'][block, None] * rng.normal(0, noise, (size, n_months))
+        rate = np.maximum(trend_part + seasonal_part + shock_part + noise_part, 0)
+        
+        chunk = pd.DataFrame({
+            'date': np.tile(dates.values, size),
+            'unemployment_rate': rate.ravel(),
+            'year': np.tile(dates.year.to_numpy(dtype=np.int16), size),
+            'month': np.tile(dates.month.to_numpy(dtype=np.int8), size),
+            'quarter': np.tile(dates.quarter.to_numpy(dtype=np.int8), size),
+            'region': pd.Categorical.from_codes(np.repeat(np.arange(block.start, block.stop), n_months), names)
+        })
+        if components:
+            chunk['trend'] = np.broadcast_to(trend_part, (size, n_months)).ravel()
+            chunk['seasonal'] = np.broadcast_to(seasonal_part, (size, n_months)).ravel()
+            chunk['shock'] = np.broadcast_to(shock_part, (size, n_months)).ravel()
+            chunk['noise'] = noise_part.ravel()
+        yield chunk
+
+def generate_sample_data(n_regions=None, n_months=180, start='2010-01-01', seed=None,
+                         trend=(8.5, 3.8), seasonal_amplitude=0.5, shocks=(COVID_SHOCK,), noise=0.2,
+                         components=False, chunk_regions=10_000):
+    """Generate synthetic unemployment data with realistic patterns
     
-    # Seasonal component (higher in winter, lower in summer)
-    seasonal = 0.5 * np.sin(2 * np.pi * np.arange(n_periods) / 12)
+    With n_regions=None this is the original single national series with
+    region labels cycled across months. Otherwise it builds a panel of
+    n_regions x n_months with per-region level, trend, seasonality, shock
+    and noise scales. components=True adds the ground-truth trend, seasonal,
+    shock and noise columns. Output is reproducible for a given seed and
+    chunk_regions.
+    """
+    logger.info("Generating sample unemployment data...")
     
-    # COVID-19 impact (sharp increase in 2020)
-    covid_impact = np.zeros(n_periods)
-    covid_start = 122  # March 2020
-    covid_impact[covid_start:covid_start+6] = [8, 12, 10, 6, 4, 2]
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    dates = pd.date_range(start, periods=n_months, freq='MS')
+    panel = n_regions is not None
+    chunks = list(_iter_panel_chunks(n_regions or 1, dates, seed, trend, seasonal_amplitude, shocks, noise,
+                                     chunk_regions, components, vary=panel))
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
     
-    # Random noise
-    noise = np.random.normal(0, 0.2, n_periods)
+    if not panel:
+        # Add some categorical regions for analysis
+        regions = SAMPLE_REGIONS * (n_months // 4 + 1)
+        df['region'] = regions[:n_months]
     
-    # Combine components
-    unemployment_rate = base_trend + seasonal + covid_impact + noise
+    logger.info(f"Generated data with {len(df)} records")
+    return df
+
+def write_sample_data(file_path, n_regions, n_months=180, start='2010-01-01', seed=None,
+                      trend=(8.5, 3.8), seasonal_amplitude=0.5, shocks=(COVID_SHOCK,), noise=0.2,
+                      components=False, chunk_regions=10_000):
+    """Stream a generated panel to CSV chunk by chunk, returning the number of rows written
     
-    # Create DataFrame
-    df = pd.DataFrame({
-        'date': dates,
-        'unemployment_rate': np.maximum(unemployment_rate, 0),
-        'year': dates.year,
-        'month': dates.month,
-        'quarter': dates.quarter
-    })
+    The file holds the same rows generate_sample_data returns for the same
+    arguments, but only one chunk of regions is in memory at a time.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    dates = pd.date_range(start, periods=n_months, freq='MS')
+    chunks = _iter_panel_chunks(n_regions, dates, seed, trend, seasonal_amplitude, shocks, noise,
+                                chunk_regions, components, vary=True)
     
-    # Add some categorical regions for analysis
-    regions = ['Northeast', 'Midwest', 'South', 'West'] * (n_periods // 4 + 1)
-    df['region'] = regions[:n_periods]
+    started = time.perf_counter()
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(file_path, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                     date_format=DATE_FORMAT)
+        rows += len(chunk)
     
-    print(f"Generated data with {len(df)} records")
-    return df
+    logger.info(f"Wrote {rows:,} rows to {file_path} in {time.perf_counter() - started:.1f}s")
+    return rows
+
+# Declared schema for the CSV extracts; integers are sized to their value ranges
+CSV_SCHEMA = {
+    'region': 'category',
+    'year': 'int16',
+    'month': 'int8',
+    'quarter': 'int8',
+    'unemployment_rate': 'float32'
+}
+DATE_FORMAT = '%Y-%m-%d'
 
 def load_real_data(file_path):
     """Load real unemployment data from CSV file"""
     try:
         df = pd.read_csv(file_path)
         df['date'] = pd.to_datetime(df['date'])
-        print(f"Loaded real data from {file_path}")
+        logger.info(f"Loaded real data from {file_path}")
         return df
     except FileNotFoundError:
-        print("Real data file not found. Using sample data.")
-        return generate_sample_data()
\ No newline at end of file
+        logger.info("Real data file not found. Using sample data.")
+        return generate_sample_data()
+
+def _filter_chunk(chunk, regions, start_date, end_date):
+    """Apply region and date-range filters to a single parsed chunk"""
+    mask = np.ones(len(chunk), dtype=bool)
+    if regions is not None and 'region' in chunk.columns:
+        mask &= chunk['region'].isin(regions).to_numpy()
+    if start_date is not None:
+        mask &= (chunk['date'] >= start_date).to_numpy()
+    if end_date is not None:
+        mask &= (chunk['date'] <= end_date).to_numpy()
+    if mask.all():
+        return chunk
+    return chunk[mask]
+
+def concat_chunks(chunks, columns):
+    """Concatenate chunks, unifying per-chunk region categories
+    
+    Regions whose rows were all filtered out are dropped from the categories.
+    With no chunks the result is empty but typed by the declared schema.
+    """
+    if not chunks:
+        return pd.DataFrame({name: pd.Series(dtype='datetime64[ns]' if name == 'date' else CSV_SCHEMA.get(name, object))
+                             for name in columns})
+    
+    region_values = None
+    if 'region' in columns:
+        region_values = union_categoricals([chunk['region'] for chunk in chunks],
+                                           ignore_order=True).remove_unused_categories()
+        chunks = [chunk.drop(columns='region') for chunk in chunks]
+    
+    df = pd.concat(chunks, ignore_index=True)
+    if region_values is not None:
+        df.insert(columns.index('region'), 'region', region_values)
+    return df
+
+def load_real_data_streaming(file_path, regions=None, start_date=None, end_date=None,
+                             usecols=None, chunksize=1_000_000, date_format=DATE_FORMAT, measure_memory=False):
+    """Load unemployment data in chunks using the declared CSV schema
+    
+    Rows outside ``regions`` or the ``start_date``/``end_date`` range are
+    dropped chunk by chunk, so they are never held in memory together.
+    Ingestion throughput is stored in ``df.attrs['ingest']``. With
+    ``measure_memory=True`` the peak traced allocation is recorded too; it is
+    left out (None) when another tracemalloc trace is already running, since
+    measuring would reset that trace's peak.
+    """
+    start_date = pd.Timestamp(start_date) if start_date is not None else None
+    end_date = pd.Timestamp(end_date) if end_date is not None else None
+    if usecols is not None:
+        usecols = list(dict.fromkeys(['date', *usecols]))
+        if regions is not None and 'region' not in usecols:
+            usecols.append('region')
+    
+    # Only trace when asked, and never disturb a trace started by the caller
+    tracing = measure_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    started = time.perf_counter()
+    
+    try:
+        rows_read = 0
+        columns = usecols or []
+        chunks = []
+        reader = pd.read_csv(file_path, usecols=usecols, dtype=CSV_SCHEMA, chunksize=chunksize)
+        for chunk in reader:
+            rows_read += len(chunk)
+            columns = list(chunk.columns)
+            chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+            chunk = _filter_chunk(chunk, regions, start_date, end_date)
+            if len(chunk):
+                chunks.append(chunk)
+        df = concat_chunks(chunks, columns)
+    except FileNotFoundError:
+        logger.info("Real data file not found. Using sample data.")
+        return generate_sample_data()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak_bytes = tracemalloc.get_traced_memory()[1] if tracing else None
+        if tracing:
+            tracemalloc.stop()
+    
+    rows_per_sec = rows_read / elapsed if elapsed > 0 else float('inf')
+    df.attrs['ingest'] = {
+        'rows_read': rows_read,
+        'rows_kept': len(df),
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'peak_memory_mb': peak_bytes / 1024 ** 2 if peak_bytes is not None else None
+    }
+    memory = f", peak memory {peak_bytes / 1024 ** 2:.1f} MB" if peak_bytes is not None else ""
+    logger.info(f"Loaded {len(df):,} of {rows_read:,} rows from {file_path} "
+          f"({rows_per_sec:,.0f} rows/sec{memory})")
+    return df
\ No newline at end of file
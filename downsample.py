@@ -0,0 +1,97 @@
+import numpy as np
+
+# Points kept per plotted line; about one per horizontal pixel of a
+# half-width axis at the default size and 300 DPI
+DEFAULT_POINT_BUDGET = 2000
+HISTOGRAM_BINS = 30
+# Bars kept in a ranked bar chart (half from each end)
+DEFAULT_BAR_BUDGET = 40
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def lttb_indices(x, y, n_out):
+    """Positions kept by Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last point and, from each of n_out - 2 equal-count
+    buckets, the point forming the largest triangle with the point kept from
+    the previous bucket and the mean of the next one. x must be sorted.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Mean point of every bucket, used as the far corner of the triangles
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < n_out - 2:
+            far_x, far_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        else:
+            far_x, far_y = x[n - 1], y[n - 1]
+        area = np.abs((x[previous] - far_x) * (y[lo:hi] - y[previous])
+                      - (x[previous] - x[lo:hi]) * (far_y - y[previous]))
+        previous = lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo
+        kept[bucket + 1] = previous
+    return kept
+
+def minmax_indices(y, n_buckets):
+    """Positions of the minimum and maximum of each of n_buckets equal-count buckets
+
+    Keeps the envelope of the data (every extreme a pixel column would show),
+    so it suits series that interleave several lines, such as a panel sorted
+    by date.
+    """
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    bucket = np.arange(n) * n_buckets // n
+    # Within each bucket, NaN sorts last and is never chosen over a number
+    order = np.lexsort((np.nan_to_num(y, nan=np.inf), bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    valid_counts = np.add.reduceat((~np.isnan(y[order])).astype(np.int64), starts)
+    ends = starts + np.maximum(valid_counts - 1, 0)
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+def downsample(x, y, budget=DEFAULT_POINT_BUDGET):
+    """Reduce a line to about budget points, keeping its visual shape
+
+    Uses LTTB when x is strictly increasing (one series) and min/max
+    buckets otherwise. Lines within budget, or budget=None, are unchanged.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if budget is None or len(y) <= budget:
+        return x, y
+    x_values = _as_float(x)
+    if len(x) > 1 and np.all(np.diff(x_values) > 0):
+        kept = lttb_indices(x, y, budget)
+    else:
+        kept = minmax_indices(y, budget // 2)
+    return x[kept], y[kept]
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    """Pre-binned counts and edges; draw with ax.hist(edges[:-1], edges, weights=counts)"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.histogram(values[~np.isnan(values)], bins=bins)
+
+def ranked_extremes(series, budget=DEFAULT_BAR_BUDGET):
+    """The lowest and highest budget // 2 entries of a Series sorted by value
+
+    Ranked bar charts of thousands of categories are unreadable; the ends of
+    the ranking are what they are read for. budget=None keeps every entry.
+    """
+    series = series.sort_values()
+    if budget is None or len(series) <= budget:
+        return series
+    return series.iloc[np.r_[0:budget // 2, len(series) - (budget - budget // 2):len(series)]]
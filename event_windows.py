@@ -0,0 +1,165 @@
+import pandas as pd
+import numpy as np
+
+# Each event has a baseline ('pre'), shock ('during') and 'post' window given
+# as inclusive (start, end) dates; None leaves that side of the window open
+GREAT_RECESSION = {
+    'name': 'Great Recession',
+    'pre': ('2007-01-01', '2007-11-01'),
+    'during': ('2007-12-01', '2009-06-01'),
+    'post': ('2009-07-01', None)
+}
+COVID_19 = {
+    'name': 'COVID-19',
+    'pre': ('2019-01-01', '2020-02-01'),
+    'during': ('2020-03-01', '2021-12-01'),
+    'post': ('2022-01-01', None)
+}
+DEFAULT_EVENTS = [GREAT_RECESSION, COVID_19]
+
+def window_slice(dates, start=None, end=None, inclusive='both'):
+    """Positions of a date window in a sorted datetime array, found by binary search"""
+    dates = np.asarray(dates)
+    lo, hi = 0, len(dates)
+    if start is not None:
+        side = 'left' if inclusive in ('both', 'left') else 'right'
+        lo = dates.searchsorted(np.datetime64(pd.Timestamp(start)), side=side)
+    if end is not None:
+        side = 'right' if inclusive in ('both', 'right') else 'left'
+        hi = dates.searchsorted(np.datetime64(pd.Timestamp(end)), side=side)
+    return slice(lo, max(lo, hi))
+
+def sorted_by_date(df):
+    """Return df sorted by date, without copying when it already is"""
+    if df['date'].is_monotonic_increasing:
+        return df
+    return df.sort_values('date', kind='stable')
+
+def _month_ordinal(dates):
+    dates = pd.DatetimeIndex(dates)
+    return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+def build_event_index(df, value_col='unemployment_rate', group_col='region'):
+    """Sort the panel by (series, date) once into arrays that support binary-search windows
+
+    Duplicate (series, date) rows are averaged; group_col=None treats the
+    data as one series.
+    """
+    if group_col is not None and group_col in df.columns:
+        values = df.groupby([group_col, 'date'], observed=True, sort=True)[value_col].mean()
+        series_codes, series = pd.factorize(values.index.get_level_values(group_col), sort=True)
+    else:
+        values = df.groupby('date', sort=True)[value_col].mean()
+        series_codes = np.zeros(len(values), dtype=np.int64)
+        series = pd.Index([value_col])
+
+    dates = pd.DatetimeIndex(values.index.get_level_values('date'))
+    days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    bounds = np.searchsorted(series_codes, np.arange(len(series) + 1))
+    return {
+        'series': series,
+        'keys': (series_codes.astype(np.int64) << 32) + days,
+        'dates': dates.to_numpy(),
+        'months': _month_ordinal(dates),
+        'values': values.to_numpy(dtype=np.float64),
+        'bounds': bounds
+    }
+
+def _window_bounds(index, start, end):
+    """Row ranges [lo, hi) of an inclusive date window for every series"""
+    n_series = len(index['series'])
+    codes = np.arange(n_series, dtype=np.int64) << 32
+    if start is None:
+        lo = index['bounds'][:-1]
+    else:
+        day = np.datetime64(pd.Timestamp(start), 'D').astype(np.int64)
+        lo = index['keys'].searchsorted(codes + day, side='left')
+    if end is None:
+        hi = index['bounds'][1:]
+    else:
+        day = np.datetime64(pd.Timestamp(end), 'D').astype(np.int64)
+        hi = index['keys'].searchsorted(codes + day, side='right')
+    return lo, np.maximum(lo, hi)
+
+def _window_means(prefix_sum, prefix_count, lo, hi):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (prefix_sum[hi] - prefix_sum[lo]) / (prefix_count[hi] - prefix_count[lo])
+
+def _window_peaks(values, lo, hi):
+    """Maximum and position of the first maximum of each [lo, hi) segment"""
+    n_series = len(lo)
+    peak = np.full(n_series, np.nan)
+    peak_pos = np.full(n_series, -1, dtype=np.int64)
+    lengths = hi - lo
+    nonempty = lengths > 0
+    if not nonempty.any():
+        return peak, peak_pos
+
+    # Gather every segment into one contiguous array, then reduce per segment
+    lo, lengths = lo[nonempty], lengths[nonempty]
+    seg_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    positions = np.repeat(lo - seg_starts, lengths) + np.arange(lengths.sum())
+    gathered = values[positions]
+    seg_peak = np.fmax.reduceat(gathered, seg_starts)
+    is_peak = gathered == np.repeat(seg_peak, lengths)
+    first = np.minimum.reduceat(np.where(is_peak, positions, len(values)), seg_starts)
+
+    peak[nonempty] = seg_peak
+    peak_pos[nonempty] = np.where(first < len(values), first, -1)
+    return peak, peak_pos
+
+def event_metrics(df, events=DEFAULT_EVENTS, value_col='unemployment_rate', group_col='region',
+                  tolerance=0.0, index=None):
+    """Baseline, peak, % increase and months-to-recover for every event x series
+
+    Recovery is the first month after the peak whose value is at or below
+    baseline * (1 + tolerance); months_to_recover is NaN if that never happens.
+    """
+    if index is None:
+        index = build_event_index(df, value_col, group_col)
+    values = index['values']
+    n = len(values)
+    valid = ~np.isnan(values)
+    prefix_sum = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    prefix_count = np.concatenate([[0], np.cumsum(valid)])
+    series_lengths = np.diff(index['bounds'])
+    series_end = index['bounds'][1:]
+    positions = np.arange(n)
+
+    results = []
+    for event in events:
+        baseline = _window_means(prefix_sum, prefix_count, *_window_bounds(index, *event['pre']))
+        during_lo, during_hi = _window_bounds(index, *event['during'])
+        post_lo, post_hi = _window_bounds(index, *event['post'])
+        during_avg = _window_means(prefix_sum, prefix_count, during_lo, during_hi)
+        post_avg = _window_means(prefix_sum, prefix_count, post_lo, post_hi)
+        peak, peak_pos = _window_peaks(values, during_lo, during_hi)
+
+        # First recovered row at or after each position, by a reverse running minimum
+        threshold = np.repeat(baseline * (1 + tolerance), series_lengths)
+        recovered = np.where(values <= threshold, positions, n)
+        next_recovered = np.minimum.accumulate(recovered[::-1])[::-1]
+        next_recovered = np.append(next_recovered, n)
+        has_peak = peak_pos >= 0
+        recovery_pos = np.where(has_peak, next_recovered[np.where(has_peak, peak_pos + 1, n)], n)
+        recovered_ok = has_peak & (recovery_pos < series_end)
+        safe_recovery = np.where(recovered_ok, recovery_pos, 0)
+        safe_peak = np.where(has_peak, peak_pos, 0)
+        months_to_recover = np.where(
+            recovered_ok, index['months'][safe_recovery] - index['months'][safe_peak], np.nan)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pct_increase = (peak - baseline) / baseline * 100
+        results.append(pd.DataFrame({
+            'event': event['name'],
+            'series': index['series'],
+            'baseline': baseline,
+            'peak': peak,
+            'peak_date': np.where(has_peak, index['dates'][safe_peak], np.datetime64('NaT')),
+            'pct_increase': pct_increase,
+            'during_avg': during_avg,
+            'post_avg': post_avg,
+            'recovery_date': np.where(recovered_ok, index['dates'][safe_recovery], np.datetime64('NaT')),
+            'months_to_recover': months_to_recover
+        }))
+    return pd.concat(results, ignore_index=True)
@@ -1,68 +1,130 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 import numpy as np
+from aggregates import build_aggregate_cube, rollup, cube_mean, cube_std
+from downsample import downsample, histogram, ranked_extremes
+from rendering import RENDER_SETTINGS, make_spec, render
+from sketches import STATS_BACKENDS, summarize
+from instrumentation import get_logger
 
-def plot_overview(df):
-    """Create overview visualizations"""
-    print("Creating overview visualizations...")
+logger = get_logger(__name__)
+
+def overview_spec(df, cube=None):
+    """Compute the data behind the overview figure"""
+    if cube is None:
+        cube = build_aggregate_cube(df)
+    yearly_avg = cube_mean(cube, 'year')
+    regional_avg = cube_mean(cube, 'region')
+    n_regions = len(regional_avg)
+    regional_avg = ranked_extremes(regional_avg, RENDER_SETTINGS['bar_budget'])
+    
+    # Reduce the raw rows to what the figure can show: a point-budgeted line
+    # and histogram counts instead of every value
+    dates, rates = downsample(df['date'].to_numpy(), df['unemployment_rate'].to_numpy(),
+                              RENDER_SETTINGS['point_budget'])
+    hist_counts, hist_edges = histogram(df['unemployment_rate'].to_numpy())
+    
+    return make_spec(
+        'overview_analysis', 'exploratory_analysis:draw_overview',
+        dates=dates,
+        rates=rates,
+        hist_counts=hist_counts,
+        hist_edges=hist_edges,
+        mean_rate=float(cube_mean(cube)),
+        years=yearly_avg.index.to_numpy(),
+        yearly_avg=yearly_avg.to_numpy(),
+        regions=regional_avg.index.astype(str).tolist(),
+        regional_avg=regional_avg.to_numpy(),
+        n_regions=n_regions
+    )
+
+def draw_overview(data):
+    """Draw the overview figure from its spec data"""
+    import matplotlib.pyplot as plt
     
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
     fig.suptitle('Unemployment Rate Analysis - Overview', fontsize=16, fontweight='bold')
     
     # Overall trend
-    axes[0, 0].plot(df['date'], df['unemployment_rate'], linewidth=2, color='navy')
+    axes[0, 0].plot(data['dates'], data['rates'], linewidth=2, color='navy')
     axes[0, 0].set_title('Overall Trend (2010-2024)')
     axes[0, 0].set_xlabel('Year')
     axes[0, 0].set_ylabel('Unemployment Rate (%)')
     axes[0, 0].grid(True, alpha=0.3)
     
     # Distribution
-    axes[0, 1].hist(df['unemployment_rate'], bins=30, alpha=0.7, color='skyblue', edgecolor='black')
-    axes[0, 1].axvline(df['unemployment_rate'].mean(), color='red', linestyle='--', 
-                      label=f'Mean: {df["unemployment_rate"].mean():.2f}%')
+    axes[0, 1].hist(data['hist_edges'][:-1], bins=data['hist_edges'], weights=data['hist_counts'],
+                    alpha=0.7, color='skyblue', edgecolor='black')
+    axes[0, 1].axvline(data['mean_rate'], color='red', linestyle='--', 
+                      label=f'Mean: {data["mean_rate"]:.2f}%')
     axes[0, 1].set_title('Distribution of Unemployment Rates')
     axes[0, 1].set_xlabel('Unemployment Rate (%)')
     axes[0, 1].legend()
     
     # Yearly averages
-    yearly_avg = df.groupby('year')['unemployment_rate'].mean()
-    axes[1, 0].plot(yearly_avg.index, yearly_avg.values, marker='o', linewidth=2)
+    axes[1, 0].plot(data['years'], data['yearly_avg'], marker='o', linewidth=2)
     axes[1, 0].set_title('Yearly Average Unemployment Rate')
     axes[1, 0].set_xlabel('Year')
     axes[1, 0].set_ylabel('Average Unemployment Rate (%)')
     axes[1, 0].grid(True, alpha=0.3)
     
     # Regional comparison
-    regional_avg = df.groupby('region')['unemployment_rate'].mean().sort_values()
-    axes[1, 1].barh(regional_avg.index, regional_avg.values, alpha=0.7)
-    axes[1, 1].set_title('Average Unemployment Rate by Region')
+    axes[1, 1].barh(data['regions'], data['regional_avg'], alpha=0.7)
+    title = 'Average Unemployment Rate by Region'
+    if len(data['regions']) < data['n_regions']:
+        title += f" (lowest and highest {len(data['regions'])} of {data['n_regions']})"
+    axes[1, 1].set_title(title)
     axes[1, 1].set_xlabel('Average Unemployment Rate (%)')
     
     plt.tight_layout()
-    plt.savefig('output/overview_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
-    
     return fig
 
-def calculate_basic_statistics(df):
-    """Calculate and display basic statistics"""
-    print("\n" + "="*50)
-    print("BASIC STATISTICS")
-    print("="*50)
+def plot_overview(df, cube=None):
+    """Create overview visualizations"""
+    logger.info("Creating overview visualizations...")
+    return render(overview_spec(df, cube))
+
+def calculate_basic_statistics(df, cube=None, backend='exact', summary=None):
+    """Calculate and display basic statistics
+    
+    Returns the period as 'YYYY-MM' strings and every statistic as a float
+    (percent); the formatted values are only logged. backend='sketch' takes every statistic from one pass of a StreamingSummary
+    (exact moments, approximate quantiles); pass summary to reuse one already
+    merged from chunks or workers.
+    """
+    if backend not in STATS_BACKENDS:
+        raise ValueError(f"Statistics backend must be one of {STATS_BACKENDS}")
+    if backend == 'sketch':
+        if summary is None:
+            summary = summarize(df['unemployment_rate'].to_numpy())
+        values = summary.summary()
+    else:
+        if cube is None:
+            cube = build_aggregate_cube(df)
+        totals = rollup(cube)
+        values = {
+            'mean': totals['sum'] / totals['count'],
+            'median': df['unemployment_rate'].median(),
+            'std': cube_std(cube),
+            'min': totals['min'],
+            'max': totals['max'],
+            'q25': df['unemployment_rate'].quantile(0.25),
+            'q75': df['unemployment_rate'].quantile(0.75)
+        }
+    
+    logger.info("\n" + "="*50)
+    logger.info("BASIC STATISTICS")
+    logger.info("="*50)
     
     stats = {
-        'Total Period': f"{df['date'].min().strftime('%Y-%m')} to {df['date'].max().strftime('%Y-%m')}",
-        'Mean Unemployment Rate': f"{df['unemployment_rate'].mean():.2f}%",
-        'Median Unemployment Rate': f"{df['unemployment_rate'].median():.2f}%",
-        'Standard Deviation': f"{df['unemployment_rate'].std():.2f}%",
-        'Minimum Rate': f"{df['unemployment_rate'].min():.2f}%",
-        'Maximum Rate': f"{df['unemployment_rate'].max():.2f}%",
-        '25th Percentile': f"{df['unemployment_rate'].quantile(0.25):.2f}%",
-        '75th Percentile': f"{df['unemployment_rate'].quantile(0.75):.2f}%"
+        'period_start': df['date'].min().strftime('%Y-%m'),
+        'period_end': df['date'].max().strftime('%Y-%m'),
+        **{key: float(values[key]) for key in ('mean', 'median', 'std', 'min', 'max', 'q25', 'q75')}
     }
     
-    for key, value in stats.items():
-        print(f"{key}: {value}")
+    logger.info(f"Total Period: {stats['period_start']} to {stats['period_end']}")
+    for label, key in [('Mean Unemployment Rate', 'mean'), ('Median Unemployment Rate', 'median'),
+                       ('Standard Deviation', 'std'), ('Minimum Rate', 'min'), ('Maximum Rate', 'max'),
+                       ('25th Percentile', 'q25'), ('75th Percentile', 'q75')]:
+        logger.info(f"{label}: {stats[key]:.2f}%")
     
     return stats
\ No newline at end of file
@@ -0,0 +1,289 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from seasonal_analysis import panel_decomposition
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+FORECAST_VERSION = 1
+HORIZON = 12
+# Lags (in months) fed to the pooled regression, and the months of the
+# trailing mean every value is measured from
+LAGS = (1, 2, 3)
+LEVEL_WINDOW = 12
+# Months of deseasonalized history behind each series' trend line
+TREND_WINDOW = 24
+# Ridge penalty relative to the mean diagonal of X'X, keeps the solve stable
+RIDGE = 1e-6
+# Series per block when accumulating the design matrix
+SERIES_BLOCK = 512
+STATE_DIR = os.path.join('.cache', 'forecast')
+
+def _adjusted(decomposition):
+    """Deseasonalized values: observed minus each series' seasonal index"""
+    return decomposition['observed'] - np.nan_to_num(decomposition['seasonal'])
+
+def _seasonal_ahead(decomposition, horizon):
+    """Seasonal index of every series for each of the horizon months after the panel"""
+    indices = decomposition['seasonal_indices'].reindex(columns=range(1, 13), fill_value=0.0)
+    last = decomposition['dates'][-1]
+    months = (last.month + np.arange(1, horizon + 1) - 1) % 12 + 1
+    return np.nan_to_num(indices.to_numpy()[:, months - 1])
+
+def _trailing_mean(values, window=LEVEL_WINDOW):
+    """Mean of the previous window months at every position, NaN unless all are present"""
+    n_series, n_periods = values.shape
+    valid = ~np.isnan(values)
+    zeros = np.zeros((n_series, 1))
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    mean = np.full(values.shape, np.nan)
+    if n_periods > window:
+        ends = np.arange(window, n_periods)
+        total = csum[:, ends] - csum[:, ends - window]
+        mean[:, window:] = np.where(ccount[:, ends] - ccount[:, ends - window] == window, total / window, np.nan)
+    return mean
+
+def _design_block(adjusted, first_target, lags=LAGS):
+    """Regression rows for every target month from first_target on
+
+    Each value and its lags are measured from the trailing mean before the
+    target month, so one set of coefficients fits series at any level. X
+    holds an intercept and the lagged deviations, y the deviation of the
+    target month. Rows with any missing value are left out. Returns (X, y).
+    """
+    n_periods = adjusted.shape[1]
+    first_target = max(first_target, max(lags), LEVEL_WINDOW)
+    if first_target >= n_periods:
+        return np.empty((0, len(lags) + 1)), np.empty(0)
+    level = _trailing_mean(adjusted)[:, first_target:]
+    targets = adjusted[:, first_target:] - level
+    columns = [np.ones_like(targets)] + [adjusted[:, first_target - lag:n_periods - lag] - level for lag in lags]
+    X = np.stack(columns, axis=-1).reshape(-1, len(lags) + 1)
+    y = targets.ravel()
+    complete = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    return X[complete], y[complete]
+
+def _normal_equations(adjusted, first_target, lags, workers):
+    """X'X, X'y and row count over all series, accumulated in parallel series blocks"""
+    def block(lo):
+        X, y = _design_block(adjusted[lo:lo + SERIES_BLOCK], first_target, lags)
+        return X.T @ X, X.T @ y, len(y)
+
+    size = len(lags) + 1
+    xtx, xty, rows = np.zeros((size, size)), np.zeros(size), 0
+    starts = range(0, len(adjusted), SERIES_BLOCK)
+    # NumPy releases the GIL in the matrix products, so threads use every core
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for block_xtx, block_xty, block_rows in executor.map(block, starts):
+            xtx += block_xtx
+            xty += block_xty
+            rows += block_rows
+    return xtx, xty, rows
+
+def _solve(xtx, xty):
+    penalty = RIDGE * max(np.trace(xtx) / len(xtx), 1e-12)
+    return np.linalg.solve(xtx + penalty * np.eye(len(xtx)), xty)
+
+def _history_fingerprint(decomposition, n_periods):
+    """Hash of the series labels and their observed values in the first n_periods months"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\x1f'.join(map(str, decomposition['series'])).encode())
+    digest.update(np.ascontiguousarray(decomposition['observed'][:, :n_periods], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def fit_lag_model(decomposition, state=None, lags=LAGS, workers=None):
+    """Fit one autoregression of deseasonalized values, jointly across all series
+
+    The fit is kept as the normal equations (X'X, X'y), so a state from an
+    earlier fit is warm-started: only months after its last_date are added.
+    The state records a fingerprint of the history it was fitted on, and is
+    refitted from scratch when that history differs (other source data,
+    revised or rescaled values, other series), as well as for other lags or
+    an older version. Returns the new state.
+    """
+    adjusted = _adjusted(decomposition)
+    dates = decomposition['dates']
+    first_date = str(dates[0])
+    usable = (state is not None and state['version'] == FORECAST_VERSION
+              and tuple(state['lags']) == tuple(lags) and state['first_date'] == first_date)
+    if usable:
+        first_target = int(dates.searchsorted(pd.Timestamp(state['last_date']), side='right'))
+        usable = state.get('history') == _history_fingerprint(decomposition, first_target)
+    if usable:
+        xtx, xty, rows = np.array(state['xtx']), np.array(state['xty']), state['rows']
+    else:
+        first_target = 0
+        size = len(lags) + 1
+        xtx, xty, rows = np.zeros((size, size)), np.zeros(size), 0
+
+    new_xtx, new_xty, new_rows = _normal_equations(adjusted, first_target, lags, workers)
+    xtx, xty, rows = xtx + new_xtx, xty + new_xty, rows + new_rows
+    if rows == 0:
+        raise ValueError(f"Not enough history for a lag model (needs more than {max(max(lags), LEVEL_WINDOW)} months)")
+    return {
+        'version': FORECAST_VERSION,
+        'lags': list(lags),
+        'first_date': first_date,
+        'last_date': str(dates[-1]),
+        'history': _history_fingerprint(decomposition, len(dates)),
+        'rows': int(rows),
+        'rows_added': int(new_rows),
+        'warm_start': bool(usable),
+        'xtx': xtx.tolist(),
+        'xty': xty.tolist(),
+        'coefficients': _solve(xtx, xty).tolist()
+    }
+
+def _lag_forecast(adjusted, state, horizon):
+    """Deseasonalized forecasts by rolling the fitted model forward one month at a time"""
+    lags = state['lags']
+    coefficients = np.asarray(state['coefficients'])
+    n_periods = adjusted.shape[1]
+    path = np.concatenate([adjusted, np.full((len(adjusted), horizon), np.nan)], axis=1)
+    for t in range(n_periods, n_periods + horizon):
+        level = path[:, t - LEVEL_WINDOW:t].mean(axis=1)
+        deviation = coefficients[0] + sum(coef * (path[:, t - lag] - level)
+                                          for coef, lag in zip(coefficients[1:], lags))
+        path[:, t] = level + deviation
+    return path[:, n_periods:]
+
+def _trend_forecast(adjusted, horizon, window=TREND_WINDOW):
+    """Deseasonalized forecasts from a least-squares line through each series' last window months"""
+    recent = adjusted[:, -window:]
+    t = np.arange(recent.shape[1], dtype=float)
+    valid = ~np.isnan(recent)
+    n = valid.sum(axis=1)
+    values = np.where(valid, recent, 0.0)
+    times = np.where(valid, t, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_t = times.sum(axis=1) / n
+        mean_y = values.sum(axis=1) / n
+        covariance = (np.where(valid, (t - mean_t[:, None]) * (recent - mean_y[:, None]), 0.0)).sum(axis=1)
+        spread = (np.where(valid, (t - mean_t[:, None]) ** 2, 0.0)).sum(axis=1)
+        slope = np.where(spread > 0, covariance / spread, 0.0)
+    ahead = t[-1] + np.arange(1, horizon + 1)
+    return mean_y[:, None] + slope[:, None] * (ahead - mean_t[:, None])
+
+def forecast_panel(df, horizon=HORIZON, decomposition=None, state=None, workers=None,
+                   value_col='unemployment_rate'):
+    """Forecast every series horizon months past the end of the data
+
+    Deseasonalized values are forecast by the pooled lag model (see
+    fit_lag_model) and the series' seasonal indices are added back. Series
+    without the recent history the lag model needs fall back to a trend line
+    through their last TREND_WINDOW months. Pass a result of
+    panel_decomposition to reuse one, and the state of an earlier fit to
+    warm-start this one.
+
+    Returns (forecasts, state): one row per series and month with the model
+    used, and the fitted state to save for the next run.
+    """
+    if decomposition is None:
+        decomposition = panel_decomposition(df, value_col=value_col)
+    state = fit_lag_model(decomposition, state, workers=workers)
+    adjusted = _adjusted(decomposition)
+    seasonal = _seasonal_ahead(decomposition, horizon)
+
+    lag_values = _lag_forecast(adjusted, state, horizon)
+    trend_values = _trend_forecast(adjusted, horizon)
+    use_lag = ~np.isnan(lag_values)
+    values = np.maximum(np.where(use_lag, lag_values, trend_values) + seasonal, 0.0)
+
+    n_series = len(values)
+    dates = pd.date_range(decomposition['dates'][-1], periods=horizon + 1, freq='MS')[1:]
+    forecasts = pd.DataFrame({
+        'series': np.repeat(np.asarray(decomposition['series']), horizon),
+        'date': np.tile(dates, n_series),
+        'horizon': np.tile(np.arange(1, horizon + 1), n_series),
+        'forecast': values.ravel(),
+        'model': np.where(use_lag, 'lag', 'trend').ravel()
+    })
+    return forecasts, state
+
+def backtest(df, horizon=HORIZON, value_col='unemployment_rate', workers=None):
+    """Mean absolute error of each model on the last horizon months, fitted on the rest
+
+    A seasonal naive forecast (the same month a year earlier) is the baseline.
+    """
+    decomposition = panel_decomposition(df, value_col=value_col)
+    cutoff = decomposition['dates'][-horizon]
+    history = df[df['date'] < cutoff]
+    actual = decomposition['observed'][:, -horizon:]
+    fitted = panel_decomposition(history, value_col=value_col)
+
+    adjusted = _adjusted(fitted)
+    seasonal = _seasonal_ahead(fitted, horizon)
+    state = fit_lag_model(fitted, workers=workers)
+    predictions = {
+        'lag': _lag_forecast(adjusted, state, horizon) + seasonal,
+        'trend': _trend_forecast(adjusted, horizon) + seasonal,
+        'seasonal_naive': fitted['observed'][:, -12:][:, np.arange(horizon) % 12]
+    }
+    # Series present in both fits line up by label
+    rows = pd.Index(decomposition['series']).get_indexer(fitted['series'])
+    keep = rows >= 0
+    actual = actual[rows[keep]]
+    with np.errstate(invalid='ignore'):
+        return {name: float(np.nanmean(np.abs(values[keep] - actual))) for name, values in predictions.items()}
+
+def forecast_summary(forecasts):
+    """Headline numbers of a forecast table"""
+    next_month = forecasts[forecasts['horizon'] == 1]['forecast']
+    final = forecasts[forecasts['horizon'] == forecasts['horizon'].max()]['forecast']
+    return {
+        'series': int(forecasts['series'].nunique()),
+        'horizon': int(forecasts['horizon'].max()),
+        'first_date': str(forecasts['date'].min().date()),
+        'last_date': str(forecasts['date'].max().date()),
+        'mean_next_month': float(next_month.mean()),
+        'mean_final_month': float(final.mean()),
+        'trend_fallback_series': int(forecasts.loc[forecasts['model'] == 'trend', 'series'].nunique())
+    }
+
+def generate_forecasts(df, horizon=HORIZON, state_dir=None, output_dir=None, workers=None):
+    """Forecast every series, warm-starting from and saving to state_dir when given
+
+    Writes forecasts.csv to output_dir when given. Returns the headline
+    numbers, the fitted coefficients and the forecast table.
+    """
+    logger.info("Forecasting every series...")
+    state = load_forecast_state(state_dir) if state_dir else None
+    forecasts, state = forecast_panel(df, horizon, state=state, workers=workers)
+    if state_dir:
+        save_forecast_state(state, state_dir)
+    if output_dir:
+        forecasts.to_csv(os.path.join(output_dir, 'forecasts.csv'), index=False)
+    
+    summary = forecast_summary(forecasts)
+    logger.info("\n" + "="*50)
+    logger.info("FORECAST")
+    logger.info("="*50)
+    logger.info(f"Forecast {summary['horizon']} months ({summary['first_date']} to {summary['last_date']}) "
+                f"for {summary['series']} series")
+    fit = "warm start, " if state['warm_start'] else ""
+    logger.info(f"Lag model fitted on {state['rows']:,} series-months ({fit}{state['rows_added']:,} new)")
+    logger.info(f"Mean forecast next month: {summary['mean_next_month']:.2f}%")
+    logger.info(f"Mean forecast in {summary['horizon']} months: {summary['mean_final_month']:.2f}%")
+    if summary['trend_fallback_series']:
+        logger.info(f"{summary['trend_fallback_series']} series lack recent history and use their trend line")
+    
+    return dict(summary, coefficients=state['coefficients'], warm_start=state['warm_start'], forecasts=forecasts)
+
+def save_forecast_state(state, state_dir=STATE_DIR):
+    """Persist a fitted lag model as JSON"""
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, 'state.json'), 'w') as f:
+        json.dump(state, f)
+
+def load_forecast_state(state_dir=STATE_DIR):
+    """Load a state saved by save_forecast_state, or None if there is none"""
+    path = os.path.join(state_dir, 'state.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,93 @@
+import os
+import json
+import pandas as pd
+import numpy as np
+from cache import write_frame, read_frame
+from data_cleaner import add_derived_features, DERIVED_COLUMNS, FEATURES_VERSION
+from sketches import MomentAccumulator
+
+# Rows of history per series needed to recompute every derived feature
+TAIL_ROWS = 12
+STATE_DIR = os.path.join('.cache', 'incremental')
+
+def _moments(values):
+    """Count, mean, sum of squared deviations, min and max of an array"""
+    return MomentAccumulator().update(values).to_dict()
+
+def merge_moments(a, b):
+    """Combine two sets of running moments (Chan et al. parallel update)"""
+    return MomentAccumulator.from_dict(a).merge(MomentAccumulator.from_dict(b)).to_dict()
+
+def _series_tail(df, group_col):
+    """Last TAIL_ROWS rows of every series, in date order"""
+    df = df.sort_values('date', kind='stable')
+    if group_col is None:
+        return df.tail(TAIL_ROWS)
+    return df.groupby(group_col, observed=True, sort=False).tail(TAIL_ROWS)
+
+def build_update_state(df, value_col='unemployment_rate', group_col='region'):
+    """Capture what a later append needs: per-series tail rows and running moments"""
+    base_columns = [col for col in df.columns if col not in DERIVED_COLUMNS]
+    if group_col not in df.columns:
+        group_col = None
+    return {
+        'version': FEATURES_VERSION,
+        'value_col': value_col,
+        'group_col': group_col,
+        'last_date': str(df['date'].max()),
+        'moments': _moments(df[value_col].to_numpy()),
+        'tail': _series_tail(df[base_columns], group_col).reset_index(drop=True)
+    }
+
+def append_observations(state, new_rows):
+    """Derive features for new rows and update the state in O(new rows)
+
+    Returns the enhanced new rows and the updated state. Rows must be newer
+    than everything already in the state; late data needs a full rebuild.
+    """
+    if state['version'] != FEATURES_VERSION:
+        raise ValueError("Update state was built by an older feature version; rebuild it")
+    if new_rows['date'].min() <= pd.Timestamp(state['last_date']):
+        raise ValueError("New rows overlap the existing history; rebuild the state instead")
+
+    value_col, group_col = state['value_col'], state['group_col']
+    tail = state['tail']
+    new_rows = new_rows.sort_values('date', kind='stable')[list(tail.columns)]
+    combined = pd.concat([tail, new_rows], ignore_index=True)
+    enhanced = add_derived_features(combined).iloc[len(tail):].reset_index(drop=True)
+
+    updated = dict(state)
+    updated['last_date'] = str(new_rows['date'].max())
+    updated['moments'] = merge_moments(state['moments'], _moments(new_rows[value_col].to_numpy()))
+    updated['tail'] = _series_tail(combined, group_col).reset_index(drop=True)
+    return enhanced, updated
+
+def summary_statistics(state):
+    """Mean, standard deviation, min and max from the running moments"""
+    moments = MomentAccumulator.from_dict(state['moments'])
+    count = moments.count
+    return {
+        'count': count,
+        'mean': moments.mean if count else np.nan,
+        'std': moments.std(),
+        'min': moments.min if count else np.nan,
+        'max': moments.max if count else np.nan,
+        'last_date': state['last_date']
+    }
+
+def save_update_state(state, state_dir=STATE_DIR):
+    """Persist the state as a columnar tail frame plus a JSON header"""
+    write_frame(state['tail'], os.path.join(state_dir, 'tail'))
+    header = {key: value for key, value in state.items() if key != 'tail'}
+    with open(os.path.join(state_dir, 'state.json'), 'w') as f:
+        json.dump(header, f)
+
+def load_update_state(state_dir=STATE_DIR):
+    """Load a state saved by save_update_state, or None if there is none"""
+    header_path = os.path.join(state_dir, 'state.json')
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path) as f:
+        state = json.load(f)
+    state['tail'] = read_frame(os.path.join(state_dir, 'tail'), mmap=False)
+    return state
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import platform
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+LOGGER_NAME = 'unemployment'
+
+def get_logger(name):
+    """Logger for a pipeline module; all of them share the LOGGER_NAME parent"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+def configure_logging(quiet=False, level=logging.INFO):
+    """Send pipeline messages to stdout as plain lines; quiet keeps only warnings and errors, on stderr"""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers.clear()
+    logger.propagate = False
+    if quiet:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+        return logger
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+def rss_mb():
+    """Current resident set size in MB, if it can be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, if it can be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+class RunManifest:
+    """Collects per-stage timings, memory use, row counts and figure render times"""
+
+    def __init__(self, trace_memory=False, profile=False):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.started = time.time()
+        self.stages = []
+        self.figures = []
+        self._profiles = {}
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows_in=None, profile=True):
+        """Measure the enclosed block; set record['rows_out'] inside it"""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        rss_before = rss_mb()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self.profile and profile else None
+        if profiler:
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            if profiler:
+                profiler.disable()
+                self._profiles[name] = profiler
+            rss_after = rss_mb()
+            if rss_before is not None and rss_after is not None:
+                record['rss_delta_mb'] = rss_after - rss_before
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['traced_delta_mb'] = (current - traced_before) / 1024 ** 2
+                record['traced_peak_mb'] = (peak - traced_before) / 1024 ** 2
+            self.stages.append(record)
+
+    def add_figures(self, records):
+        """Record render results ({'name', 'path', 'seconds'} dicts)"""
+        self.figures.extend(records)
+
+    def hottest_stage(self):
+        """The stage with the longest wall time, or None"""
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda record: record['seconds'])['stage']
+
+    def dump_profile(self, path):
+        """Write cProfile stats of the hottest profiled stage to path"""
+        hottest = max((r for r in self.stages if r['stage'] in self._profiles),
+                      key=lambda record: record['seconds'], default=None)
+        if hottest is None:
+            return None
+        self._profiles[hottest['stage']].dump_stats(path)
+        return hottest['stage']
+
+    def to_dict(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_seconds': time.time() - self.started,
+            'python': platform.python_version(),
+            'peak_rss_mb': peak_rss_mb(),
+            'hottest_stage': self.hottest_stage(),
+            'stages': self.stages,
+            'figures': self.figures
+        }
+
+    def write(self, path):
+        """Write the manifest as JSON"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
@@ -1,69 +1,338 @@
 import os
+import json
+import shutil
+import argparse
 import pandas as pd
-from data_loader import generate_sample_data, load_real_data
-from data_cleaner import clean_unemployment_data, add_derived_features
+import numpy as np
+from aggregates import build_aggregate_cube
+from cache import CACHE_DIR, MAX_CACHE_BYTES, file_fingerprint, stage_key, cached_stage, contains
+from data_loader import generate_sample_data, load_real_data, load_real_data_streaming
+from data_cleaner import clean_unemployment_data, add_derived_features, CLEAN_VERSION, FEATURES_VERSION
 from exploratory_analysis import plot_overview, calculate_basic_statistics
 from covid_impact import analyze_covid_impact
-from seasonal_analysis import analyze_seasonal_patterns
+from seasonal_analysis import analyze_seasonal_patterns, seasonal_summary
 from policy_insights import generate_policy_insights
+from forecasting import HORIZON, generate_forecasts
+from sketches import STATS_BACKENDS, summarize
+from incremental import build_update_state, append_observations, summary_statistics, save_update_state, load_update_state
+from instrumentation import RunManifest, configure_logging, get_logger
+from pipeline import stage, run_pipeline
+from rendering import RENDER_SETTINGS, RENDER_MODES, RENDER_FORMATS, configure_rendering, shutdown_rendering
 
-def main():
+logger = get_logger(__name__)
+
+DATA_PATH = 'data/unemployment_data.csv'  # Change path as needed
+STAGE_NAMES = ['load', 'clean', 'enhance', 'cube', 'summary', 'statistics', 'overview', 'covid', 'seasonal',
+               'seasonal_summary', 'policy', 'forecast']
+DEFAULT_TARGETS = ['statistics', 'overview', 'covid', 'seasonal', 'policy', 'forecast']
+# Stages behind --json; none of them import matplotlib, seaborn or statsmodels
+NUMBERS_TARGETS = ['statistics', 'covid', 'seasonal_summary']
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Run the unemployment analysis pipeline')
+    parser.add_argument('--data', default=DATA_PATH, help='CSV file with unemployment data')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Neither read nor write the stage cache')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='Ignore cached stage outputs and rebuild them')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Directory for cached stage outputs')
+    parser.add_argument('--cache-max-mb', type=float, default=MAX_CACHE_BYTES / 1024 ** 2,
+                        help='Size limit of the stage cache in MB')
+    parser.add_argument('--render', choices=RENDER_MODES, default='pool',
+                        help="Draw figures inline, in a process pool, or not at all ('none')")
+    parser.add_argument('--dpi', type=int, default=RENDER_SETTINGS['dpi'], help='Figure resolution')
+    parser.add_argument('--format', choices=RENDER_FORMATS, default=RENDER_SETTINGS['format'],
+                        help='Figure file format')
+    parser.add_argument('--workers', type=int, default=None, help='Number of render processes')
+    parser.add_argument('--point-budget', type=int, default=RENDER_SETTINGS['point_budget'],
+                        help='Most points drawn per line; 0 draws every point')
+    parser.add_argument('--output-dir', default=RENDER_SETTINGS['output_dir'], help='Directory for figures')
+    parser.add_argument('--show', action='store_true', help='Display figures when rendering inline')
+    parser.add_argument('--quiet', action='store_true', help='Silence progress and findings output')
+    parser.add_argument('--manifest', help='Where to write the JSON run manifest (default: in the output directory)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Record tracemalloc allocation deltas per stage (slower)')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='Profile every stage and write cProfile stats of the slowest one to PATH')
+    parser.add_argument('--only', nargs='+', choices=STAGE_NAMES, metavar='STAGE',
+                        help=f"Run only these stages and their dependencies ({', '.join(STAGE_NAMES)})")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Threads for running independent stages concurrently; their console '
+                             'output interleaves and rss_delta_mb overlaps when above 1')
+    parser.add_argument('--json', action='store_true',
+                        help='Print statistics, COVID metrics and seasonal indices as JSON; no figures')
+    parser.add_argument('--stats-backend', choices=STATS_BACKENDS, default='exact',
+                        help='Exact statistics, or one-pass moments with a quantile sketch')
+    parser.add_argument('--lean', action='store_true',
+                        help='Clean into compact dtypes with a single copy and add features in place')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Load the CSV in chunks with the declared column types')
+    parser.add_argument('--regions', nargs='+', metavar='REGION',
+                        help='Only load these regions (implies --streaming)')
+    parser.add_argument('--since', help='Only load rows on or after this date (implies --streaming)')
+    parser.add_argument('--until', help='Only load rows on or before this date (implies --streaming)')
+    parser.add_argument('--horizon', type=int, default=HORIZON, help='Months forecast past the end of the data')
+    parser.add_argument('--append', metavar='CSV',
+                        help='Only derive features and statistics for new rows, reusing the saved update state')
+    return parser.parse_args(argv)
+
+def _load_params(args):
+    """Loader options that change the loaded rows or dtypes, or None for the plain loader"""
+    if not (args.streaming or args.regions or args.since or args.until):
+        return None
+    return {'streaming': True, 'regions': sorted(args.regions) if args.regions else None,
+            'since': args.since, 'until': args.until}
+
+def load_data(args, file_path):
+    """Load a CSV with the loader chosen on the command line"""
+    params = _load_params(args)
+    if params is None:
+        return load_real_data(file_path)
+    return load_real_data_streaming(file_path, params['regions'], params['since'], params['until'])
+
+def build_stages(args, fingerprint=None):
+    """Declare the analysis as a stage graph
+    
+    load -> clean -> enhance -> {statistics, overview, covid, seasonal} -> policy
+                               -> forecast
+    
+    fingerprint is the source file's file_fingerprint, when already computed.
+    """
+    # Sample data has no source file to key the cache on
+    use_cache = not args.no_cache and os.path.exists(args.data)
+    cache_options = {
+        'cache_dir': args.cache_dir,
+        'max_bytes': int(args.cache_max_mb * 1024 ** 2),
+        'rebuild': args.rebuild_cache
+    }
+    keys = {}
+    if use_cache:
+        params = {}
+        if args.lean:
+            params['lean'] = True
+        if _load_params(args):
+            params['load'] = _load_params(args)
+        fingerprint = fingerprint or file_fingerprint(args.data)
+        keys['clean'] = stage_key(fingerprint, 'clean', CLEAN_VERSION, params or None)
+        keys['enhance'] = stage_key(keys['clean'], 'enhance', FEATURES_VERSION)
+    
+    # Cache hits are decided here, so a stage that has to be rebuilt declares
+    # its input as a dependency and is measured apart from it
+    def hit(name):
+        return use_cache and not args.rebuild_cache and contains(keys[name], args.cache_dir)
+    enhance_hit = hit('enhance')
+    clean_hit = enhance_hit or hit('clean')
+    
+    # pull() is only a fallback for an entry evicted since the check above
+    def input_of(inputs, pull, name):
+        return inputs[name] if name in inputs else pull(name)
+    
+    def load(inputs, pull):
+        # Try to load real data, fall back to sample data
+        df = load_data(args, args.data)
+        if df is None:
+            df = generate_sample_data()
+        return df
+    
+    def clean(inputs, pull):
+        def build():
+            return clean_unemployment_data(input_of(inputs, pull, 'load'), lean=args.lean)
+        return cached_stage(keys['clean'], build, **cache_options) if use_cache else build()
+    
+    # The lean cleaned frame is only an intermediate, so features go straight into it
+    def enhance(inputs, pull):
+        def build():
+            return add_derived_features(input_of(inputs, pull, 'clean'), copy=not args.lean)
+        return cached_stage(keys['enhance'], build, **cache_options) if use_cache else build()
+    
+    # With the sketch backend one streaming summary feeds both statistics and policy
+    sketch = args.stats_backend == 'sketch'
+    summary_deps = ['summary'] if sketch else []
+    
+    def summary_of(inputs):
+        return inputs['summary'] if sketch else None
+    
+    # The fitted lag model lives next to the stage cache and is warm-started
+    # with each month of new data
+    forecast_state_dir = os.path.join(args.cache_dir, 'forecast') if use_cache else None
+    
+    def forecast(inputs, pull):
+        if forecast_state_dir and args.rebuild_cache:
+            shutil.rmtree(forecast_state_dir, ignore_errors=True)
+        return generate_forecasts(inputs['enhance'], args.horizon, forecast_state_dir, args.output_dir)
+    
+    return {
+        'load': stage(load, banner="📊 STEP 1: Loading Data"),
+        'clean': stage(clean, deps=[] if clean_hit else ['load'], banner="🧹 STEP 2: Cleaning Data"),
+        'enhance': stage(enhance, deps=[] if enhance_hit else ['clean']),
+        'cube': stage(lambda inputs, pull: build_aggregate_cube(inputs['enhance']), deps=['enhance']),
+        'summary': stage(lambda inputs, pull: summarize(inputs['enhance']['unemployment_rate'].to_numpy(), seed=0),
+                         deps=['enhance']),
+        'statistics': stage(lambda inputs, pull: calculate_basic_statistics(inputs['enhance'], inputs['cube'],
+                                                                            args.stats_backend, summary_of(inputs)),
+                            deps=['enhance', 'cube'] + summary_deps, banner="🔍 STEP 3: Exploratory Analysis"),
+        'overview': stage(lambda inputs, pull: plot_overview(inputs['enhance'], inputs['cube']),
+                          deps=['enhance', 'cube']),
+        'covid': stage(lambda inputs, pull: analyze_covid_impact(inputs['enhance']),
+                       deps=['enhance'], banner="🦠 STEP 4: COVID-19 Impact Analysis"),
+        'seasonal': stage(lambda inputs, pull: analyze_seasonal_patterns(inputs['enhance'], inputs['cube']),
+                          deps=['enhance', 'cube'], banner="📅 STEP 5: Seasonal Pattern Analysis"),
+        'seasonal_summary': stage(lambda inputs, pull: seasonal_summary(inputs['enhance'], inputs['cube']),
+                                  deps=['enhance', 'cube']),
+        'policy': stage(lambda inputs, pull: generate_policy_insights(inputs['enhance'], inputs['covid'],
+                                                                     inputs['seasonal'], inputs['cube'],
+                                                                     args.stats_backend, summary_of(inputs)),
+                        deps=['enhance', 'covid', 'seasonal', 'cube'] + summary_deps,
+                        banner="💡 STEP 6: Generating Policy Insights"),
+        'forecast': stage(forecast, deps=['enhance'], banner="🔮 STEP 7: Forecasting")
+    }
+
+def update_state_dir(args, fingerprint):
+    """Where the update state of the source file is kept, keyed by its fingerprint"""
+    return os.path.join(args.cache_dir, 'incremental', fingerprint)
+
+def save_initial_update_state(args, df_enhanced, fingerprint):
+    """Save the update state a later --append run starts from, unless the source already has one
+    
+    A state that --append has advanced is kept until the cache is rebuilt.
+    """
+    state_dir = update_state_dir(args, fingerprint)
+    if args.rebuild_cache or load_update_state(state_dir) is None:
+        save_update_state(build_update_state(df_enhanced), state_dir)
+
+def run_incremental_update(args):
+    """Append new observations using the update state saved by the previous run"""
+    if not os.path.exists(args.data):
+        raise SystemExit("No saved update state; run the full analysis first")
+    state_dir = update_state_dir(args, file_fingerprint(args.data))
+    state = load_update_state(state_dir)
+    if state is None:
+        raise SystemExit("No saved update state; run the full analysis first")
+    if not os.path.exists(args.append):
+        raise SystemExit(f"New data file not found: {args.append}")
+    
+    new_rows = clean_unemployment_data(load_data(args, args.append))
+    try:
+        enhanced, state = append_observations(state, new_rows)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    save_update_state(state, state_dir)
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    updates_path = os.path.join(args.output_dir, 'enhanced_updates.csv')
+    enhanced.to_csv(updates_path, mode='a', index=False, header=not os.path.exists(updates_path))
+    
+    logger.info("\n" + "="*50)
+    logger.info("UPDATED STATISTICS")
+    logger.info("="*50)
+    logger.info(f"Appended {len(enhanced)} rows (features written to {updates_path})")
+    for key, value in summary_statistics(state).items():
+        logger.info(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+def jsonable(value, frame_orient='records'):
+    """Convert results into plain JSON values at every depth (NaN and NaT become null)"""
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient=frame_orient, date_format='iso'))
+    if isinstance(value, pd.Series):
+        return {str(key): jsonable(item, frame_orient) for key, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key): jsonable(item, frame_orient) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [jsonable(item, frame_orient) for item in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else str(pd.Timestamp(value))
+    return value
+
+def _without_decompositions(value):
+    """Drop decomposition arrays (and the forecast table) from nested results"""
+    if isinstance(value, dict):
+        return {key: _without_decompositions(item) for key, item in value.items()
+                if not str(key).endswith('decomposition') and key != 'forecasts'}
+    if isinstance(value, (list, tuple)):
+        return [_without_decompositions(item) for item in value]
+    return value
+
+def numbers_report(outputs):
+    """JSON-ready view of the numeric stage outputs"""
+    report = {}
+    for name, output in outputs.items():
+        if name in ('load', 'clean', 'enhance', 'cube', 'summary') or not isinstance(output, dict):
+            continue
+        report[name] = jsonable(_without_decompositions({
+            key: value for key, value in output.items() if not isinstance(value, pd.Series)
+        }))
+    return report
+
+def main(argv=None):
     """Main function to run the complete unemployment analysis"""
-    print("🚀 Starting Comprehensive Unemployment Analysis")
-    print("="*60)
+    args = parse_args(argv)
+    if args.json:
+        args.render, args.quiet = 'none', True
+        args.only = args.only or NUMBERS_TARGETS
+    configure_logging(quiet=args.quiet)
+    configure_rendering(mode=args.render, dpi=args.dpi, format=args.format,
+                        workers=args.workers, output_dir=args.output_dir, show=args.show,
+                        point_budget=args.point_budget or None)
+    if args.append:
+        run_incremental_update(args)
+        return
+    
+    manifest = RunManifest(trace_memory=args.trace_memory, profile=bool(args.profile))
+    
+    logger.info("🚀 Starting Comprehensive Unemployment Analysis")
+    logger.info("="*60)
     
     # Create output directory
-    os.makedirs('output', exist_ok=True)
-    
-    # Step 1: Load data
-    print("\n📊 STEP 1: Loading Data")
-    print("-" * 30)
-    
-    # Try to load real data, fall back to sample data
-    df = load_real_data('data/unemployment_data.csv')  # Change path as needed
-    if df is None:
-        df = generate_sample_data()
-    
-    # Step 2: Clean and prepare data
-    print("\n🧹 STEP 2: Cleaning Data")
-    print("-" * 30)
-    df_clean = clean_unemployment_data(df)
-    df_enhanced = add_derived_features(df_clean)
-    
-    # Step 3: Exploratory Analysis
-    print("\n🔍 STEP 3: Exploratory Analysis")
-    print("-" * 30)
-    basic_stats = calculate_basic_statistics(df_enhanced)
-    overview_fig = plot_overview(df_enhanced)
-    
-    # Step 4: COVID-19 Impact Analysis
-    print("\n🦠 STEP 4: COVID-19 Impact Analysis")
-    print("-" * 30)
-    covid_results = analyze_covid_impact(df_enhanced)
-    
-    # Step 5: Seasonal Analysis
-    print("\n📅 STEP 5: Seasonal Pattern Analysis")
-    print("-" * 30)
-    seasonal_results = analyze_seasonal_patterns(df_enhanced)
-    
-    # Step 6: Policy Insights
-    print("\n💡 STEP 6: Generating Policy Insights")
-    print("-" * 30)
-    policy_insights = generate_policy_insights(df_enhanced, covid_results, seasonal_results)
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    # Run the requested targets and the stages they depend on
+    # Hash the (possibly very large) source once for the stage cache and the update state
+    use_cache = not args.no_cache and os.path.exists(args.data)
+    fingerprint = file_fingerprint(args.data) if use_cache else None
+    stages = build_stages(args, fingerprint)
+    targets = args.only or DEFAULT_TARGETS
+    # Inline rendering draws with pyplot, which is not thread-safe, and
+    # profiling or memory tracing can only attribute costs to serial stages
+    serial = args.render == 'inline' or args.profile or args.trace_memory
+    jobs = 1 if serial else args.jobs
+    outputs = run_pipeline(stages, targets, max_workers=jobs, manifest=manifest)
+    # Lets the next monthly refresh run with --append; written once, after
+    # the stages, so concurrent stages and runs never share a half-written state
+    if 'enhance' in outputs and use_cache:
+        save_initial_update_state(args, outputs['enhance'], fingerprint)
+    
+    # Wait for figures still rendering in the background
+    with manifest.stage('render_wait', profile=False):
+        manifest.add_figures(shutdown_rendering())
+    
+    manifest_path = args.manifest or os.path.join(args.output_dir, 'run_manifest.json')
+    manifest.write(manifest_path)
+    if args.profile:
+        profiled = manifest.dump_profile(args.profile)
+        logger.info(f"\nProfile of slowest stage '{profiled}' written to {args.profile}")
     
     # Final Summary
-    print("\n" + "="*60)
-    print("✅ ANALYSIS COMPLETED SUCCESSFULLY!")
-    print("="*60)
-    print("\n📁 Output files saved in '/output' directory:")
-    print("   - overview_analysis.png")
-    print("   - covid_impact.png")
-    print("   - seasonal_decomposition.png")
-    print("   - seasonal_heatmap.png")
-    print("   - policy_insights.png")
-    
-    print("\n🎯 Key findings and policy recommendations have been generated.")
-    print("   Use these insights to inform economic and social policies.")
+    logger.info("\n" + "="*60)
+    logger.info("✅ ANALYSIS COMPLETED SUCCESSFULLY!")
+    logger.info("="*60)
+    logger.info(f"\n📁 Output files saved in '{args.output_dir}' directory:")
+    for figure in manifest.figures:
+        logger.info(f"   - {os.path.basename(figure['path'])}")
+    logger.info(f"   - {os.path.basename(manifest_path)}")
+    
+    logger.info("\n🎯 Key findings and policy recommendations have been generated.")
+    logger.info("   Use these insights to inform economic and social policies.")
+    
+    if args.json:
+        print(json.dumps(numbers_report(outputs), indent=2, allow_nan=False))
+    return outputs
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
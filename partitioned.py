@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import shutil
+import argparse
+import pandas as pd
+import numpy as np
+from aggregates import build_aggregate_cube
+from cache import write_frame, read_frame
+from data_loader import CSV_SCHEMA, DATE_FORMAT, concat_chunks
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+PARTITIONS_FILE = 'partitions.json'
+# Source CSV bytes per partition when the partition count is not given
+PARTITION_BYTES = 256 * 1024 ** 2
+RATE_RANGE = (0, 50)
+# Integer columns are read as nullable so rows with missing values can be counted and dropped
+READ_SCHEMA = {name: dtype.capitalize() if dtype.startswith('int') else dtype for name, dtype in CSV_SCHEMA.items()}
+
+def _bucket_ids(regions, n_buckets):
+    """Stable hash bucket of every region (the same across chunks and runs)"""
+    return np.array([zlib.crc32(str(region).encode()) % n_buckets for region in regions], dtype=np.int64)
+
+def _spill_chunk(chunk, n_buckets, spill_dir, chunk_index, spilled):
+    """Split one chunk by (region bucket, year) and write each piece as a spill file
+
+    spilled accumulates the bytes written per (bucket, year), which later
+    sizes the date-range runs each bucket is split into.
+    """
+    years = chunk['date'].dt.year.to_numpy()
+    if 'region' in chunk.columns:
+        regions = chunk['region'].astype('category').cat
+        region_codes, region_names = regions.codes.to_numpy(), regions.categories
+    else:
+        region_codes, region_names = np.zeros(len(chunk), dtype=np.int64), pd.Index([''])
+    buckets = _bucket_ids(region_names, n_buckets)[region_codes]
+    key_codes, keys = pd.factorize(buckets * 10_000 + years)
+
+    order = np.argsort(key_codes, kind='stable')
+    bounds = np.searchsorted(key_codes[order], np.arange(len(keys) + 1))
+    for code, key in enumerate(keys):
+        bucket, year = divmod(int(key), 10_000)
+        piece = chunk.iloc[order[bounds[code]:bounds[code + 1]]].reset_index(drop=True)
+        write_frame(piece, os.path.join(spill_dir, f"bucket-{bucket:05d}", f"year-{year:04d}",
+                                        f"chunk-{chunk_index:06d}"))
+        spilled[bucket, year] = spilled.get((bucket, year), 0) + int(piece.memory_usage(deep=True).sum())
+
+def _plan_runs(spilled, n_partitions):
+    """Split each bucket's years into consecutive runs of about 1/n_partitions of the data
+
+    Returns (bucket, run, years) in bucket then date order. A bucket of many
+    small regions stays one run; the years of a bucket holding a few large
+    regions spread over several, so n_partitions is honored either way.
+    """
+    target = sum(spilled.values()) / n_partitions
+    runs = []
+    for bucket, year in sorted(spilled):
+        size = spilled[bucket, year]
+        if not runs or runs[-1][0] != bucket or runs[-1][3] + size > target:
+            run = runs[-1][1] + 1 if runs and runs[-1][0] == bucket else 0
+            runs.append([bucket, run, [], 0])
+        runs[-1][2].append(year)
+        runs[-1][3] += size
+    return [(bucket, run, years) for bucket, run, years, _ in runs]
+
+def _finish_partition(year_dirs, columns):
+    """Merge a run's spill files, drop duplicate rows and sort by (region, date)"""
+    pieces = [read_frame(entry.path, mmap=False) for year_dir in year_dirs
+              for entry in sorted(os.scandir(year_dir), key=lambda e: e.name)]
+    df = concat_chunks(pieces, columns)
+    duplicated = df.duplicated().to_numpy()
+    if duplicated.any():
+        df = df[~duplicated]
+
+    dates = df['date'].to_numpy()
+    if 'region' in df.columns:
+        order = np.lexsort((dates, df['region'].cat.codes.to_numpy()))
+    else:
+        order = np.argsort(dates, kind='stable')
+    return df.iloc[order].reset_index(drop=True), int(duplicated.sum())
+
+def _clear_output(output_dir):
+    """Remove an earlier output of clean_out_of_core, refusing to touch any other directory"""
+    if not os.path.isdir(output_dir):
+        return
+    entries = os.listdir(output_dir)
+    if entries and PARTITIONS_FILE not in entries:
+        raise FileExistsError(f"{output_dir} is not empty and holds no partitions; choose another directory")
+    for name in entries:
+        path = os.path.join(output_dir, name)
+        if name == PARTITIONS_FILE:
+            os.remove(path)
+        elif (name == 'spill' or name.startswith('part-')) and os.path.isdir(path):
+            shutil.rmtree(path)
+
+def clean_out_of_core(file_path, output_dir, n_partitions=None, chunksize=1_000_000, date_format=DATE_FORMAT):
+    """Clean a CSV that need not fit in memory into region partitions on disk
+
+    Chunks are validated as they stream in (missing values are dropped and
+    the rate range is tracked) and spilled by a stable hash of the region
+    and by year. Each region bucket is then cut into consecutive date-range
+    runs, one partition each, named part-<bucket>-<run> and listed in that
+    order in partitions.json. Duplicates always land in the same run, so
+    each partition is deduplicated and sorted by (region, date) on its own.
+    Only one chunk or one partition is in memory at a time. A region's
+    series continues, in date order, through its bucket's runs; read whole
+    series back with iter_series.
+
+    output_dir must be empty, missing, or an earlier output of this
+    function; only the files it wrote there are replaced.
+    """
+    if n_partitions is None:
+        n_partitions = max(1, math.ceil(os.path.getsize(file_path) / PARTITION_BYTES))
+    logger.info(f"Cleaning {file_path} out of core into {n_partitions} partitions...")
+    started = time.perf_counter()
+
+    _clear_output(output_dir)
+    spill_dir = os.path.join(output_dir, 'spill')
+    spilled = {}
+    rows_read = missing_values = 0
+    rate_min, rate_max = np.inf, -np.inf
+    columns = []
+    reader = pd.read_csv(file_path, dtype=READ_SCHEMA, chunksize=chunksize)
+    for chunk_index, chunk in enumerate(reader):
+        rows_read += len(chunk)
+        columns = list(chunk.columns)
+        missing = chunk.isna().to_numpy()
+        missing_values += int(missing.sum())
+        chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+        if missing.any():
+            chunk = chunk[~missing.any(axis=1)]
+        if len(chunk):
+            chunk = chunk.astype({name: CSV_SCHEMA[name] for name in columns
+                                  if CSV_SCHEMA.get(name, '').startswith('int')})
+            rates = chunk['unemployment_rate'].to_numpy()
+            rate_min, rate_max = min(rate_min, rates.min()), max(rate_max, rates.max())
+            _spill_chunk(chunk, n_partitions, spill_dir, chunk_index, spilled)
+
+    if missing_values > 0:
+        logger.warning(f"Found {missing_values} missing values. Dropped their rows.")
+    if rate_min < RATE_RANGE[0] or rate_max > RATE_RANGE[1]:
+        logger.warning("Warning: Unemployment rates outside expected range (0-50%)")
+
+    partitions = []
+    duplicates = 0
+    for bucket, run, years in _plan_runs(spilled, n_partitions):
+        year_dirs = [os.path.join(spill_dir, f"bucket-{bucket:05d}", f"year-{year:04d}") for year in years]
+        df, dropped = _finish_partition(year_dirs, columns)
+        duplicates += dropped
+        name = f"part-{bucket:05d}-{run:04d}"
+        write_frame(df, os.path.join(output_dir, name))
+        for year_dir in year_dirs:
+            shutil.rmtree(year_dir)
+        partitions.append({
+            'name': name,
+            'bucket': bucket,
+            'run': run,
+            'rows': len(df),
+            'regions': sorted(map(str, df['region'].unique())) if 'region' in df.columns else [],
+            'start': str(df['date'].min()) if len(df) else None,
+            'end': str(df['date'].max()) if len(df) else None
+        })
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    if duplicates > 0:
+        logger.info(f"Found {duplicates} duplicate rows. Removed them.")
+
+    summary = {
+        'source': file_path,
+        'rows_read': rows_read,
+        'rows_kept': sum(p['rows'] for p in partitions),
+        'missing_values': missing_values,
+        'duplicates': duplicates,
+        'rate_min': float(rate_min) if rows_read else None,
+        'rate_max': float(rate_max) if rows_read else None,
+        'seconds': time.perf_counter() - started,
+        'partitions': partitions
+    }
+    with open(os.path.join(output_dir, PARTITIONS_FILE), 'w') as f:
+        json.dump(summary, f, indent=2)
+    logger.info(f"Wrote {summary['rows_kept']:,} of {rows_read:,} rows to {len(partitions)} partitions "
+                f"in {output_dir} ({summary['seconds']:.1f}s)")
+    return summary
+
+def load_partition_summary(output_dir):
+    """The summary written by clean_out_of_core"""
+    with open(os.path.join(output_dir, PARTITIONS_FILE)) as f:
+        return json.load(f)
+
+def iter_partitions(output_dir, regions=None, mmap=True):
+    """Yield the cleaned partitions one at a time, each sorted by (region, date)
+
+    Partitions come in (bucket, run) order, so a region's series continues
+    in date order in the next partitions of its bucket. With regions given,
+    partitions holding none of them are not read.
+    """
+    wanted = set(regions) if regions is not None else None
+    for partition in load_partition_summary(output_dir)['partitions']:
+        if wanted is not None and not wanted.intersection(partition['regions']):
+            continue
+        df = read_frame(os.path.join(output_dir, partition['name']), mmap=mmap)
+        if wanted is not None:
+            df = df[df['region'].isin(wanted)].reset_index(drop=True)
+        yield df
+
+def iter_series(output_dir, regions=None, mmap=True):
+    """Yield (region, series) for every region, each whole series in date order
+
+    A bucket's runs are read in order and a series is yielded as soon as no
+    later run of its bucket holds the region, so only the series still open
+    in the current bucket are kept in memory.
+    """
+    wanted = set(regions) if regions is not None else None
+    partitions = load_partition_summary(output_dir)['partitions']
+    for position, partition in enumerate(partitions):
+        if position == 0 or partition['bucket'] != partitions[position - 1]['bucket']:
+            open_series = {}
+        if wanted is None or wanted.intersection(partition['regions']):
+            df = read_frame(os.path.join(output_dir, partition['name']), mmap=mmap)
+            if wanted is not None:
+                df = df[df['region'].isin(wanted)]
+            for region, series in df.groupby('region', observed=True, sort=False):
+                open_series.setdefault(region, []).append(series)
+
+        later = set()
+        for following in partitions[position + 1:]:
+            if following['bucket'] != partition['bucket']:
+                break
+            later.update(following['regions'])
+        for region in [region for region in open_series if str(region) not in later]:
+            pieces = open_series.pop(region)
+            yield region, concat_chunks(pieces, list(pieces[0].columns))
+
+def partitioned_cube(output_dir, value_col='unemployment_rate'):
+    """Aggregate cube of all partitions, built one partition at a time
+
+    Partitions hold disjoint (region, year) keys, so their cubes never share a cell.
+    """
+    cubes = [build_aggregate_cube(df, value_col) for df in iter_partitions(output_dir)]
+    return pd.concat(cubes).sort_index()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Clean an unemployment CSV larger than memory into partitions')
+    parser.add_argument('data', help='CSV file with unemployment data')
+    parser.add_argument('output_dir', help='Directory for the cleaned partitions')
+    parser.add_argument('--partitions', type=int, help='Approximate number of partitions (default: by file size)')
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help='Rows read per chunk')
+    parser.add_argument('--quiet', action='store_true', help='Silence progress output')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(quiet=args.quiet)
+    try:
+        clean_out_of_core(args.data, args.output_dir, args.partitions, args.chunksize)
+    except FileExistsError as e:
+        raise SystemExit(str(e))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# A stage is a dict with:
+#   'deps'   - stages whose outputs it always needs (scheduled before it runs)
+#   'run'    - run(inputs, pull): inputs maps each dep to its output; pull(name)
+#              computes another stage on demand, for inputs that are only
+#              sometimes needed (e.g. on a cache miss)
+#   'banner' - optional heading logged when the stage starts
+
+def stage(run, deps=(), banner=None):
+    """Declare a pipeline stage"""
+    return {'run': run, 'deps': list(deps), 'banner': banner}
+
+def dependency_closure(stages, targets):
+    """All stages needed for targets, in a valid execution order"""
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        if name in visiting:
+            raise ValueError(f"Stage dependency cycle through {name}")
+        visiting.add(name)
+        for dep in stages[name]['deps']:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+class _Run:
+    """Memoized, thread-safe execution state of one pipeline run"""
+
+    def __init__(self, stages, manifest):
+        self.stages = stages
+        self.manifest = manifest
+        self.outputs = {}
+        self.locks = {name: threading.Lock() for name in stages}
+        # Stages currently measured on each thread; a stage pulled from inside
+        # another is not profiled again (cProfile cannot nest)
+        self.active = threading.local()
+
+    def execute(self, name):
+        with self.locks[name]:
+            if name in self.outputs:
+                return self.outputs[name]
+            spec = self.stages[name]
+            inputs = {dep: self.execute(dep) for dep in spec['deps']}
+            if spec['banner']:
+                logger.info(f"\n{spec['banner']}")
+                logger.info("-" * 30)
+            if self.manifest is None:
+                output = spec['run'](inputs, self.execute)
+            else:
+                rows_in = max((len(value) for value in inputs.values() if hasattr(value, 'columns')), default=None)
+                depth = getattr(self.active, 'depth', 0)
+                self.active.depth = depth + 1
+                try:
+                    with self.manifest.stage(name, rows_in=rows_in, profile=depth == 0) as record:
+                        output = spec['run'](inputs, self.execute)
+                        if hasattr(output, 'columns'):
+                            record['rows_out'] = len(output)
+                finally:
+                    self.active.depth = depth
+            self.outputs[name] = output
+            return output
+
+def run_pipeline(stages, targets, max_workers=1, manifest=None):
+    """Run targets and everything they depend on, each stage at most once
+
+    Stages whose dependencies are complete run concurrently on up to
+    max_workers threads. Returns the outputs of every executed stage.
+    """
+    order = dependency_closure(stages, targets)
+    run = _Run(stages, manifest)
+    if max_workers <= 1:
+        for name in order:
+            run.execute(name)
+        return run.outputs
+
+    pending = set(order)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [name for name in order if name in pending
+                     and all(dep in run.outputs for dep in stages[name]['deps'])]
+            for name in ready:
+                pending.discard(name)
+                running[executor.submit(run.execute, name)] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                future.result()  # Re-raise stage errors
+    return run.outputs
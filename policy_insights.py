@@ -1,10 +1,74 @@
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+from aggregates import build_aggregate_cube, cube_mean, cube_std, cube_max
+from seasonal_analysis import panel_decomposition
+from shock_detection import detect_shocks, recovery_summary
+from downsample import ranked_extremes
+from rendering import RENDER_SETTINGS, make_spec, render
+from sketches import STATS_BACKENDS, summarize
+from instrumentation import get_logger
 
-def generate_policy_insights(df, covid_analysis, seasonal_analysis):
-    """Generate policy insights and recommendations"""
-    print("Generating policy insights...")
+logger = get_logger(__name__)
+
+def draw_policy_dashboard(data):
+    """Draw the policy insights dashboard from its spec data"""
+    import matplotlib.pyplot as plt
+    
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Policy-Ready Insights Dashboard', fontsize=16, fontweight='bold')
+    
+    # 1. Crisis impact comparison
+    crisis_labels = ['COVID-19 Peak', 'Historical Max', '95th Percentile']
+    bars1 = axes[0, 0].bar(crisis_labels, data['crisis_data'], color=['red', 'darkred', 'orange'])
+    axes[0, 0].set_title('Crisis Impact Comparison')
+    axes[0, 0].set_ylabel('Unemployment Rate (%)')
+    
+    # Add value labels on bars
+    for bar, value in zip(bars1, data['crisis_data']):
+        axes[0, 0].text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
+                       f'{value:.1f}%', ha='center', va='bottom')
+    
+    # 2. Recovery analysis
+    recovery_labels = ['Recovery\nMonths', 'Peak\nIncrease %', 'Net Change']
+    bars2 = axes[0, 1].bar(recovery_labels, data['recovery_metrics'], color=['green', 'red', 'blue'])
+    axes[0, 1].set_title('Recovery Metrics')
+    
+    # Add value labels on bars
+    for bar, value in zip(bars2, data['recovery_metrics']):
+        axes[0, 1].text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
+                       f'{value:.1f}', ha='center', va='bottom')
+    
+    # 3. Seasonal vulnerability
+    axes[1, 0].plot(data['months'], data['monthly_avg'], marker='o', linewidth=2, color='purple')
+    axes[1, 0].set_title('Seasonal Vulnerability Pattern')
+    axes[1, 0].set_xlabel('Month')
+    axes[1, 0].set_ylabel('Unemployment Rate (%)')
+    axes[1, 0].grid(True, alpha=0.3)
+    axes[1, 0].set_xticks(range(1, 13))
+    
+    # 4. Regional disparities
+    if data['regions'] is not None:
+        axes[1, 1].barh(data['regions'], data['regional_volatility'], alpha=0.7)
+        title = 'Regional Volatility (Standard Deviation)'
+        if len(data['regions']) < data['n_regions']:
+            title += f"\nlowest and highest {len(data['regions'])} of {data['n_regions']} regions"
+        axes[1, 1].set_title(title)
+        axes[1, 1].set_xlabel('Standard Deviation')
+    else:
+        axes[1, 1].text(0.5, 0.5, 'Regional data\nnot available', 
+                       ha='center', va='center', transform=axes[1, 1].transAxes)
+        axes[1, 1].set_title('Regional Volatility')
+    
+    plt.tight_layout()
+    return fig
+
+def generate_policy_insights(df, covid_analysis, seasonal_analysis, cube=None, backend='exact', summary=None):
+    """Generate policy insights and recommendations
+    
+    backend='sketch' reads the 95th percentile from a StreamingSummary
+    (summary, or one built from df) instead of sorting the data.
+    """
+    logger.info("Generating policy insights...")
     
     try:
         # Data validation
@@ -14,18 +78,29 @@ def generate_policy_insights(df, covid_analysis, seasonal_analysis):
         if 'unemployment_rate' not in df.columns:
             raise ValueError("'unemployment_rate' column not found in DataFrame")
         
+        if backend not in STATS_BACKENDS:
+            raise ValueError(f"Statistics backend must be one of {STATS_BACKENDS}")
+        
+        if cube is None:
+            cube = build_aggregate_cube(df)
+        
         # Calculate key metrics with error handling
         try:
-            overall_trend = df[df['year'] == 2024]['unemployment_rate'].mean() - df[df['year'] == 2010]['unemployment_rate'].mean()
+            yearly_avg = cube_mean(cube, 'year')
+            overall_trend = yearly_avg.get(2024, np.nan) - yearly_avg.get(2010, np.nan)
         except:
             overall_trend = 0  # Default value if calculation fails
         
-        volatility = df['unemployment_rate'].std()
+        volatility = cube_std(cube)
+        pre_covid_cells = cube[cube.index.get_level_values('year') < 2020]
         
-        # Calculate recovery speed safely
-        if 'pre_covid_avg' in covid_analysis:
-            recovery_speed = len(df[(df['date'] >= '2020-03-01') & (df['unemployment_rate'] > covid_analysis['pre_covid_avg'])])
-        else:
+        # Detected shocks of every series; recovery speed is the median time
+        # from peak back to baseline of each series' largest shock
+        regional = (seasonal_analysis or {}).get('regional_decomposition')
+        shocks = detect_shocks(df, decomposition=panel_decomposition(df, regional))
+        shock_recovery = recovery_summary(shocks)
+        recovery_speed = shock_recovery['median_months_to_recover']
+        if np.isnan(recovery_speed):
             recovery_speed = 0
         
         # Create summary report
@@ -33,70 +108,52 @@ def generate_policy_insights(df, covid_analysis, seasonal_analysis):
             'trend_analysis': {
                 'long_term_change': overall_trend,
                 'volatility': volatility,
-                'pre_covid_stability': df[df['date'] < '2020-01-01']['unemployment_rate'].std() if len(df[df['date'] < '2020-01-01']) > 0 else 0
+                'pre_covid_stability': cube_std(pre_covid_cells) if len(pre_covid_cells) > 0 else 0
             },
             'covid_impact': covid_analysis,
-            'seasonal_patterns': seasonal_analysis
+            'seasonal_patterns': seasonal_analysis,
+            'shock_recovery': shock_recovery,
+            'shocks': shocks
         }
         
         # Generate visualization
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Policy-Ready Insights Dashboard', fontsize=16, fontweight='bold')
-        
-        # 1. Crisis impact comparison
+        if backend == 'sketch':
+            high_rate = (summary or summarize(df['unemployment_rate'].to_numpy())).quantile(0.95)
+        else:
+            high_rate = df['unemployment_rate'].quantile(0.95)
         crisis_data = [
             covid_analysis.get('peak_covid_rate', 0),
-            df['unemployment_rate'].max(),
-            df['unemployment_rate'].quantile(0.95)
+            cube_max(cube),
+            high_rate
         ]
-        crisis_labels = ['COVID-19 Peak', 'Historical Max', '95th Percentile']
-        bars1 = axes[0, 0].bar(crisis_labels, crisis_data, color=['red', 'darkred', 'orange'])
-        axes[0, 0].set_title('Crisis Impact Comparison')
-        axes[0, 0].set_ylabel('Unemployment Rate (%)')
-        
-        # Add value labels on bars
-        for bar, value in zip(bars1, crisis_data):
-            axes[0, 0].text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
-                           f'{value:.1f}%', ha='center', va='bottom')
-        
-        # 2. Recovery analysis
         recovery_metrics = [
             recovery_speed,  # Months to recover
             covid_analysis.get('covid_increase_pct', 0),  # Percentage increase
             covid_analysis.get('post_covid_avg', 0) - covid_analysis.get('pre_covid_avg', 0)  # Net change
         ]
-        recovery_labels = ['Recovery\nMonths', 'Peak\nIncrease %', 'Net Change']
-        bars2 = axes[0, 1].bar(recovery_labels, recovery_metrics, color=['green', 'red', 'blue'])
-        axes[0, 1].set_title('Recovery Metrics')
-        
-        # Add value labels on bars
-        for bar, value in zip(bars2, recovery_metrics):
-            axes[0, 1].text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
-                           f'{value:.1f}', ha='center', va='bottom')
-        
-        # 3. Seasonal vulnerability
-        monthly_avg = df.groupby('month')['unemployment_rate'].mean()
-        axes[1, 0].plot(monthly_avg.index, monthly_avg.values, marker='o', linewidth=2, color='purple')
-        axes[1, 0].set_title('Seasonal Vulnerability Pattern')
-        axes[1, 0].set_xlabel('Month')
-        axes[1, 0].set_ylabel('Unemployment Rate (%)')
-        axes[1, 0].grid(True, alpha=0.3)
-        axes[1, 0].set_xticks(range(1, 13))
-        
-        # 4. Regional disparities
-        if 'region' in df.columns:
-            regional_volatility = df.groupby('region')['unemployment_rate'].std().sort_values()
-            bars4 = axes[1, 1].barh(regional_volatility.index, regional_volatility.values, alpha=0.7)
-            axes[1, 1].set_title('Regional Volatility (Standard Deviation)')
-            axes[1, 1].set_xlabel('Standard Deviation')
-        else:
-            axes[1, 1].text(0.5, 0.5, 'Regional data\nnot available', 
-                           ha='center', va='center', transform=axes[1, 1].transAxes)
-            axes[1, 1].set_title('Regional Volatility')
-        
-        plt.tight_layout()
-        plt.savefig('output/policy_insights.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        monthly_avg = cube_mean(cube, 'month')
+        regional_volatility = None
+        n_regions = 0
+        if 'region' in cube.index.names:
+            regional_volatility = cube_std(cube, 'region')
+            n_regions = len(regional_volatility)
+            regional_volatility = ranked_extremes(regional_volatility, RENDER_SETTINGS['bar_budget'])
+        
+        render(make_spec(
+            'policy_insights', 'policy_insights:draw_policy_dashboard',
+            crisis_data=crisis_data,
+            recovery_metrics=recovery_metrics,
+            months=monthly_avg.index.to_numpy(),
+            monthly_avg=monthly_avg.to_numpy(),
+            regions=None if regional_volatility is None else regional_volatility.index.astype(str).tolist(),
+            regional_volatility=None if regional_volatility is None else regional_volatility.to_numpy(),
+            n_regions=n_regions
+        ))
+        
+        if shock_recovery['series_with_shock']:
+            logger.info(f"Detected shocks in {shock_recovery['series_with_shock']} series; "
+                        f"{shock_recovery['recovered']} recovered, "
+                        f"median {shock_recovery['median_months_to_recover']:.0f} months from peak to baseline")
         
         # Print policy recommendations
         print_policy_recommendations(insights)
@@ -104,41 +161,41 @@ def generate_policy_insights(df, covid_analysis, seasonal_analysis):
         return insights
         
     except Exception as e:
-        print(f"Error in generate_policy_insights: {e}")
+        logger.exception(f"Error in generate_policy_insights: {e}")
         return None
 
 def print_policy_recommendations(insights):
     """Print formatted policy recommendations"""
-    print("\n" + "="*60)
-    print("ECONOMIC AND SOCIAL POLICY RECOMMENDATIONS")
-    print("="*60)
+    logger.info("\n" + "="*60)
+    logger.info("ECONOMIC AND SOCIAL POLICY RECOMMENDATIONS")
+    logger.info("="*60)
     
-    print("\n🚨 CRISIS PREPAREDNESS AND RESPONSE:")
-    print("   • Establish automatic unemployment benefit triggers during economic shocks")
-    print("   • Develop rapid-response job retraining programs")
-    print("   • Create digital infrastructure for remote job matching")
-    print("   • Build emergency employment programs for future crises")
+    logger.info("\n🚨 CRISIS PREPAREDNESS AND RESPONSE:")
+    logger.info("   • Establish automatic unemployment benefit triggers during economic shocks")
+    logger.info("   • Develop rapid-response job retraining programs")
+    logger.info("   • Create digital infrastructure for remote job matching")
+    logger.info("   • Build emergency employment programs for future crises")
     
-    print("\n📊 SEASONAL EMPLOYMENT STRATEGIES:")
-    print("   • Implement counter-cyclical public sector hiring")
-    print("   • Develop seasonal worker transition programs")
-    print("   • Offer tax incentives for off-season employment")
-    print("   • Create weather-adaptive employment policies")
+    logger.info("\n📊 SEASONAL EMPLOYMENT STRATEGIES:")
+    logger.info("   • Implement counter-cyclical public sector hiring")
+    logger.info("   • Develop seasonal worker transition programs")
+    logger.info("   • Offer tax incentives for off-season employment")
+    logger.info("   • Create weather-adaptive employment policies")
     
-    print("\n🎯 REGIONAL ECONOMIC DEVELOPMENT:")
-    print("   • Target economic development in high-unemployment regions")
-    print("   • Create region-specific job training programs")
-    print("   • Develop infrastructure projects in vulnerable areas")
-    print("   • Promote regional industry diversification")
+    logger.info("\n🎯 REGIONAL ECONOMIC DEVELOPMENT:")
+    logger.info("   • Target economic development in high-unemployment regions")
+    logger.info("   • Create region-specific job training programs")
+    logger.info("   • Develop infrastructure projects in vulnerable areas")
+    logger.info("   • Promote regional industry diversification")
     
-    print("\n📈 LONG-TERM WORKFORCE DEVELOPMENT:")
-    print("   • Invest in future-oriented education and training")
-    print("   • Promote entrepreneurship and small business development")
-    print("   • Strengthen apprenticeship and vocational programs")
-    print("   • Develop lifelong learning initiatives")
+    logger.info("\n📈 LONG-TERM WORKFORCE DEVELOPMENT:")
+    logger.info("   • Invest in future-oriented education and training")
+    logger.info("   • Promote entrepreneurship and small business development")
+    logger.info("   • Strengthen apprenticeship and vocational programs")
+    logger.info("   • Develop lifelong learning initiatives")
     
-    print("\n🔍 MONITORING AND EVALUATION:")
-    print("   • Implement real-time labor market monitoring")
-    print("   • Regular policy impact assessments")
-    print("   • Data-driven workforce development planning")
-    print("   • Stakeholder engagement in policy design")
\ No newline at end of file
+    logger.info("\n🔍 MONITORING AND EVALUATION:")
+    logger.info("   • Implement real-time labor market monitoring")
+    logger.info("   • Regular policy impact assessments")
+    logger.info("   • Data-driven workforce development planning")
+    logger.info("   • Stakeholder engagement in policy design")
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+from downsample import DEFAULT_POINT_BUDGET, DEFAULT_BAR_BUDGET
+
+# Figures are described by plain-data specs and drawn by a renderer function
+# ('module:function') that takes the spec data and returns a matplotlib figure
+RENDER_SETTINGS = {
+    'mode': 'inline',  # 'inline', 'pool' or 'none'
+    'dpi': 300,
+    'format': 'png',
+    'output_dir': 'output',
+    'workers': None,
+    'show': False,
+    'point_budget': DEFAULT_POINT_BUDGET,  # Points per plotted line; None draws every point
+    'bar_budget': DEFAULT_BAR_BUDGET  # Bars per ranked bar chart; None draws every bar
+}
+RENDER_MODES = ('inline', 'pool', 'none')
+RENDER_FORMATS = ('png', 'svg')
+
+_executor = None
+# Stages render from several threads; only one of them may create the pool
+_executor_lock = threading.Lock()
+_pending = []
+_completed = []
+
+def configure_rendering(**settings):
+    """Update rendering settings (mode, dpi, format, output_dir, workers, show, point_budget, bar_budget)"""
+    unknown = set(settings) - set(RENDER_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown render settings: {sorted(unknown)}")
+    if settings.get('mode', RENDER_SETTINGS['mode']) not in RENDER_MODES:
+        raise ValueError(f"Render mode must be one of {RENDER_MODES}")
+    if settings.get('format', RENDER_SETTINGS['format']) not in RENDER_FORMATS:
+        raise ValueError(f"Render format must be one of {RENDER_FORMATS}")
+
+    if settings.get('workers', RENDER_SETTINGS['workers']) != RENDER_SETTINGS['workers']:
+        shutdown_rendering()
+    RENDER_SETTINGS.update(settings)
+
+def make_spec(name, renderer, **data):
+    """Build a plot spec; data should be plain values, lists or NumPy arrays"""
+    return {'name': name, 'renderer': renderer, 'data': data}
+
+def output_path(name, output_dir=None, fmt=None):
+    """Path a figure named name is saved to"""
+    output_dir = output_dir or RENDER_SETTINGS['output_dir']
+    return os.path.join(output_dir, f"{name}.{fmt or RENDER_SETTINGS['format']}")
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+def draw_spec(spec, dpi, fmt, output_dir, show=False):
+    """Draw a spec with its renderer, save the figure and report how long it took"""
+    import matplotlib.pyplot as plt
+    
+    started = time.perf_counter()
+    module_name, func_name = spec['renderer'].split(':')
+    renderer = getattr(importlib.import_module(module_name), func_name)
+    fig = renderer(spec['data'])
+
+    path = output_path(spec['name'], output_dir, fmt)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fig.savefig(path, dpi=dpi, format=fmt, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close(fig)
+    return {'name': spec['name'], 'path': path, 'seconds': time.perf_counter() - started}
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=RENDER_SETTINGS['workers'], initializer=_init_worker)
+        return _executor
+
+def render(spec):
+    """Render a spec according to the current mode
+
+    Returns the render record ({'name', 'path', 'seconds'}) for inline
+    rendering, a Future for pool rendering and None when rendering is disabled.
+    """
+    mode = RENDER_SETTINGS['mode']
+    if mode == 'none':
+        return None
+
+    args = (spec, RENDER_SETTINGS['dpi'], RENDER_SETTINGS['format'], RENDER_SETTINGS['output_dir'])
+    if mode == 'inline':
+        record = draw_spec(*args, show=RENDER_SETTINGS['show'])
+        _completed.append(record)
+        return record
+
+    future = _get_executor().submit(draw_spec, *args)
+    _pending.append(future)
+    return future
+
+def wait_for_renders():
+    """Block until all renders finish and return their records since the last call"""
+    _completed.extend(future.result() for future in _pending)
+    _pending.clear()
+    records = list(_completed)
+    _completed.clear()
+    return records
+
+def shutdown_rendering():
+    """Wait for outstanding renders, stop the worker pool and return the render records"""
+    global _executor
+    records = wait_for_renders()
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+    return records
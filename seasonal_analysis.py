@@ -1,77 +1,259 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import warnings
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.seasonal import seasonal_decompose
+from aggregates import build_aggregate_cube, cube_mean, cube_stats, cube_pivot
+from downsample import downsample
+from rendering import RENDER_SETTINGS, make_spec, render
+from instrumentation import get_logger
 
-def analyze_seasonal_patterns(df):
-    """Analyze seasonal patterns in unemployment data"""
-    print("Analyzing seasonal patterns...")
+logger = get_logger(__name__)
+
+def _panel_array(df, value_col, group_cols):
+    """Pivot long data into a (series x time) array on a common monthly grid"""
+    keys = group_cols + ['date'] if group_cols else ['date']
+    values = df.groupby(keys, observed=True, sort=True)[value_col].mean()
     
-    # Set date as index for time series analysis
-    ts_data = df.set_index('date')['unemployment_rate']
+    dates = pd.DatetimeIndex(values.index.get_level_values('date'))
+    months = (dates.year * 12 + dates.month - 1).to_numpy()
+    first_month = months.min()
+    n_periods = months.max() - first_month + 1
+    grid = pd.date_range(dates.min(), periods=n_periods, freq='MS')
     
-    # Seasonal decomposition
-    decomposition = seasonal_decompose(ts_data, model='additive', period=12)
+    if group_cols:
+        series_index = values.index.droplevel('date')
+        series_codes, series_labels = pd.factorize(series_index, sort=True)
+    else:
+        series_codes = np.zeros(len(values), dtype=np.intp)
+        series_labels = pd.Index([value_col])
+    
+    panel = np.full((len(series_labels), n_periods), np.nan)
+    panel[series_codes, months - first_month] = values.to_numpy(dtype=float)
+    return panel, series_labels, grid
+
+def _centered_moving_average(panel, period):
+    """Centered (2 x period) moving average along axis 1, NaN where the window is incomplete"""
+    if period % 2 == 0:
+        weights = np.r_[0.5, np.ones(period - 1), 0.5] / period
+    else:
+        weights = np.ones(period) / period
+    width = len(weights)
+    half = width // 2
+    
+    valid = ~np.isnan(panel)
+    filled = np.where(valid, panel, 0.0)
+    n_series, n_periods = panel.shape
+    trend = np.full(panel.shape, np.nan)
+    if n_periods < width:
+        return trend
+    
+    # Windowed weighted sums: interior weights are equal, so use a cumulative
+    # sum for them and add the two edge terms separately
+    csum = np.concatenate([np.zeros((n_series, 1)), np.cumsum(filled, axis=1)], axis=1)
+    ccount = np.concatenate([np.zeros((n_series, 1), dtype=int), np.cumsum(valid, axis=1)], axis=1)
+    starts = np.arange(n_periods - width + 1)
+    ends = starts + width
+    window_count = ccount[:, ends] - ccount[:, starts]
+    if period % 2 == 0:
+        inner = csum[:, ends - 1] - csum[:, starts + 1]
+        sums = inner + 0.5 * (filled[:, starts] + filled[:, ends - 1])
+    else:
+        sums = csum[:, ends] - csum[:, starts]
+    trend[:, half:n_periods - half] = np.where(window_count == width, sums / period, np.nan)
+    return trend
+
+def decompose_panel(df, value_col='unemployment_rate', group_cols='region', period=12):
+    """Additive seasonal decomposition of every series in a long-format panel at once
+    
+    Matches statsmodels ``seasonal_decompose(model='additive')`` for each
+    complete series, but computes all series as one 2-D NumPy array. Pass
+    ``group_cols=None`` to decompose the data as a single series.
+    """
+    if isinstance(group_cols, str):
+        group_cols = [group_cols]
+    group_cols = [col for col in (group_cols or []) if col in df.columns]
+    
+    observed, series_labels, dates = _panel_array(df, value_col, group_cols)
+    trend = _centered_moving_average(observed, period)
+    detrended = observed - trend
+    
+    # Seasonal index per calendar position, centred to sum to zero per series
+    n_series, n_periods = observed.shape
+    n_cycles = -(-n_periods // period)
+    padded = np.full((n_series, n_cycles * period), np.nan)
+    padded[:, :n_periods] = detrended
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        period_averages = np.nanmean(padded.reshape(n_series, n_cycles, period), axis=1)
+    period_averages -= period_averages.mean(axis=1, keepdims=True)
+    seasonal = np.tile(period_averages, n_cycles)[:, :n_periods]
+    seasonal[np.isnan(observed)] = np.nan
+    resid = observed - trend - seasonal
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        seasonal_strength = np.nanstd(seasonal, axis=1, ddof=1) / np.nanstd(observed, axis=1, ddof=1)
+    
+    # Re-key the seasonal indices by the calendar month of each grid position
+    positions = np.arange(period)
+    if period == 12:
+        positions = (dates[0].month - 1 + positions) % 12 + 1
+    seasonal_indices = pd.DataFrame(period_averages, index=series_labels, columns=positions).sort_index(axis=1)
+    seasonal_indices.columns.name = 'month'
+    
+    return {
+        'series': series_labels,
+        'dates': dates,
+        'observed': observed,
+        'trend': trend,
+        'seasonal': seasonal,
+        'resid': resid,
+        'seasonal_indices': seasonal_indices,
+        'seasonal_strength': pd.Series(seasonal_strength, index=series_labels, name='seasonal_strength')
+    }
+
+def panel_decomposition(df, regional=None, value_col='unemployment_rate'):
+    """Per-region decomposition when regions form real series, else the data as one series
+    
+    Regions that only label alternate rows of one series leave a mostly empty
+    regional panel. Pass regional to reuse an existing decompose_panel result.
+    """
+    if regional is None and 'region' in df.columns:
+        regional = decompose_panel(df, value_col)
+    if regional is not None and np.isnan(regional['observed']).mean() < 0.5:
+        return regional
+    return decompose_panel(df, value_col, group_cols=None)
+
+def draw_decomposition(data):
+    """Draw the time series decomposition figure from its spec data"""
+    import matplotlib.pyplot as plt
     
-    # Plot decomposition
     fig, axes = plt.subplots(4, 1, figsize=(15, 12))
     fig.suptitle('Time Series Decomposition - Unemployment Rate', fontsize=16, fontweight='bold')
     
-    components = [
-        (decomposition.observed, 'Original Series'),
-        (decomposition.trend, 'Trend Component'),
-        (decomposition.seasonal, 'Seasonal Component'),
-        (decomposition.resid, 'Residual Component')
-    ]
-    
-    for i, (component, title) in enumerate(components):
-        axes[i].plot(component)
+    for i, (dates, component, title) in enumerate(data['components']):
+        axes[i].plot(dates, component)
         axes[i].set_title(title)
         axes[i].set_ylabel('Unemployment Rate (%)')
         axes[i].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('output/seasonal_decomposition.png', dpi=300, bbox_inches='tight')
-    plt.show()
-    
-    # Monthly patterns
-    monthly_stats = df.groupby('month').agg({
-        'unemployment_rate': ['mean', 'std', 'min', 'max']
-    }).round(3)
+    return fig
+
+def draw_heatmap(data):
+    """Draw the year x month heatmap from its spec data"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     
-    # Create heatmap
-    plt.figure(figsize=(12, 8))
-    heatmap_data = df.pivot_table(index='year', columns='month', values='unemployment_rate')
+    fig = plt.figure(figsize=(12, 8))
+    heatmap_data = pd.DataFrame(data['values'], index=data['years'], columns=data['months'])
     sns.heatmap(heatmap_data, cmap='YlOrRd', annot=False, cbar_kws={'label': 'Unemployment Rate (%)'})
     plt.title('Unemployment Rate Heatmap by Year and Month', fontsize=14, fontweight='bold')
     plt.xlabel('Month')
     plt.ylabel('Year')
     plt.tight_layout()
-    plt.savefig('output/seasonal_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return fig
+
+def analyze_seasonal_patterns(df, cube=None):
+    """Analyze seasonal patterns in unemployment data"""
+    logger.info("Analyzing seasonal patterns...")
+    if cube is None:
+        cube = build_aggregate_cube(df)
+    
+    # Decompose the monthly mean across regions as one series, so a panel's
+    # interleaved rows are never treated as consecutive months
+    decomposition = decompose_panel(df, group_cols=None)
+    
+    # Plot decomposition
+    dates = decomposition['dates'].to_numpy()
+    render(make_spec(
+        'seasonal_decomposition', 'seasonal_analysis:draw_decomposition',
+        components=[
+            (*downsample(dates, decomposition[key][0], RENDER_SETTINGS['point_budget']), title)
+            for key, title in [('observed', 'Original Series'), ('trend', 'Trend Component'),
+                               ('seasonal', 'Seasonal Component'), ('resid', 'Residual Component')]
+        ]
+    ))
+    
+    # Monthly patterns
+    monthly_stats = cube_stats(cube, 'month').round(3)
+    monthly_stats.columns = pd.MultiIndex.from_product([['unemployment_rate'], monthly_stats.columns])
+    
+    # Create heatmap
+    heatmap_data = cube_pivot(cube, 'year', 'month')
+    render(make_spec(
+        'seasonal_heatmap', 'seasonal_analysis:draw_heatmap',
+        values=heatmap_data.to_numpy(),
+        years=heatmap_data.index.tolist(),
+        months=heatmap_data.columns.tolist()
+    ))
     
     # Calculate seasonal strength
-    seasonal_strength = decomposition.seasonal.std() / decomposition.observed.std()
+    seasonal_strength = float(decomposition['seasonal_strength'].iloc[0])
+    
+    # Per-region decomposition of the whole panel in one pass
+    regional = decompose_panel(df) if 'region' in df.columns else None
     
-    print("\n" + "="*50)
-    print("SEASONAL ANALYSIS FINDINGS")
-    print("="*50)
-    print(f"Seasonal Strength: {seasonal_strength:.3f}")
-    print("\nMonthly Averages:")
+    logger.info("\n" + "="*50)
+    logger.info("SEASONAL ANALYSIS FINDINGS")
+    logger.info("="*50)
+    logger.info(f"Seasonal Strength: {seasonal_strength:.3f}")
+    logger.info("\nMonthly Averages:")
+    monthly_means = cube_mean(cube, 'month')
     for month in range(1, 13):
-        month_data = df[df['month'] == month]['unemployment_rate']
         month_name = pd.to_datetime(f'2023-{month}-01').strftime('%B')
-        print(f"  {month_name}: {month_data.mean():.2f}%")
+        logger.info(f"  {month_name}: {monthly_means.get(month, np.nan):.2f}%")
     
     highest_month = monthly_stats[('unemployment_rate', 'mean')].idxmax()
     lowest_month = monthly_stats[('unemployment_rate', 'mean')].idxmin()
     
-    print(f"\nHighest unemployment typically in: {pd.to_datetime(f'2023-{highest_month}-01').strftime('%B')}")
-    print(f"Lowest unemployment typically in: {pd.to_datetime(f'2023-{lowest_month}-01').strftime('%B')}")
+    logger.info(f"\nHighest unemployment typically in: {pd.to_datetime(f'2023-{highest_month}-01').strftime('%B')}")
+    logger.info(f"Lowest unemployment typically in: {pd.to_datetime(f'2023-{lowest_month}-01').strftime('%B')}")
+    
+    if regional is not None:
+        logger.info("\nSeasonal Strength by Region:")
+        for region, strength in regional['seasonal_strength'].items():
+            logger.info(f"  {region}: {strength:.3f}")
     
     return {
         'seasonal_strength': seasonal_strength,
         'monthly_stats': monthly_stats,
-        'decomposition': decomposition
+        'decomposition': decomposition,
+        'regional_decomposition': regional
+    }
+
+def reference_check(df, value_col='unemployment_rate', group_cols='region', period=12):
+    """Largest absolute difference between decompose_panel and statsmodels, per component
+    
+    statsmodels is only the reference the panel engine is checked against;
+    complete series (no missing months) are compared one by one.
+    """
+    from statsmodels.tsa.seasonal import seasonal_decompose
+    
+    panel = decompose_panel(df, value_col, group_cols, period)
+    worst = {'trend': 0.0, 'seasonal': 0.0, 'resid': 0.0}
+    for row, observed in enumerate(panel['observed']):
+        if np.isnan(observed).any():
+            continue
+        reference = seasonal_decompose(pd.Series(observed, index=panel['dates']), model='additive', period=period)
+        for key in worst:
+            difference = np.abs(panel[key][row] - getattr(reference, key).to_numpy())
+            worst[key] = max(worst[key], float(np.nanmax(difference)))
+    return worst
+
+def seasonal_summary(df, cube=None):
+    """Seasonal strength, indices and monthly means without statsmodels or plotting"""
+    if cube is None:
+        cube = build_aggregate_cube(df)
+    overall = decompose_panel(df, group_cols=None)
+    regional = decompose_panel(df) if 'region' in df.columns else None
+    monthly_means = cube_mean(cube, 'month')
+    
+    return {
+        'seasonal_strength': float(overall['seasonal_strength'].iloc[0]),
+        'seasonal_indices': {int(month): float(value) for month, value in overall['seasonal_indices'].iloc[0].items()},
+        'monthly_means': {int(month): float(value) for month, value in monthly_means.items()},
+        'highest_month': int(monthly_means.idxmax()),
+        'lowest_month': int(monthly_means.idxmin()),
+        'regional_seasonal_strength': {} if regional is None else
+            {str(region): float(value) for region, value in regional['seasonal_strength'].items()}
     }
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import stat
+import json
+import argparse
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import UnixStreamServer
+from urllib.parse import urlparse, parse_qs
+from aggregates import build_aggregate_cube, cube_stats, cube_std
+from covid_impact import analyze_covid_impact
+from event_windows import sorted_by_date, window_slice
+from exploratory_analysis import calculate_basic_statistics
+from seasonal_analysis import decompose_panel
+from instrumentation import configure_logging, get_logger
+from rendering import configure_rendering
+from pipeline import run_pipeline
+import main
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+
+class QueryCache:
+    """Thread-safe LRU cache of query results"""
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # Compute outside the lock so slow queries do not block other clients
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class AnalysisService:
+    """Keeps the enhanced data resident and answers parameterized queries from it"""
+
+    def __init__(self, data_path, cache_size=CACHE_SIZE, pipeline_args=()):
+        self.data_path = data_path
+        self.pipeline_args = list(pipeline_args)
+        self.cache = QueryCache(cache_size)
+        self.lock = threading.Lock()
+        self.source_stamp = None
+        self.version = 0
+        self.df = None
+        self.reload()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.data_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        """Load and enhance the source data (through the stage cache) and drop cached results"""
+        args = main.parse_args(['--data', self.data_path, '--render', 'none', *self.pipeline_args])
+        stamp = self._stamp()
+        # The pipeline falls back to sample data for a missing file; the server
+        # must never answer queries from it
+        if stamp is None:
+            if self.df is None:
+                raise FileNotFoundError(f"Input file not found: {self.data_path}")
+            self.source_stamp = None
+            logger.warning(f"{self.data_path} is missing; still serving data version {self.version}")
+            return
+        outputs = run_pipeline(main.build_stages(args), ['enhance'])
+        self.df = sorted_by_date(outputs['enhance'])
+        self.source_stamp = stamp
+        self.version += 1
+        self.cache.clear()
+        logger.info(f"Loaded {len(self.df):,} rows from {self.data_path} (data version {self.version})")
+
+    def ensure_fresh(self):
+        """Reload when the source file changed since it was loaded"""
+        if self._stamp() != self.source_stamp:
+            with self.lock:
+                # Another request may have reloaded while this one waited
+                if self._stamp() != self.source_stamp:
+                    self.reload()
+
+    def _select(self, params):
+        """Rows matching the region/since/until parameters"""
+        df = self.df
+        since, until = params.get('since'), params.get('until')
+        if since or until:
+            df = df.iloc[window_slice(df['date'].to_numpy(), since, until)]
+        if params.get('region'):
+            df = df[df['region'].isin(params['region'].split(','))]
+        if df.empty:
+            raise ValueError("No data matches the query parameters")
+        return df
+
+    def _stats(self, params):
+        return calculate_basic_statistics(self._select(params))
+
+    def _covid(self, params):
+        results = analyze_covid_impact(self._select(params))
+        results['event_impact'] = results['event_impact'].to_dict('records')
+        return results
+
+    @staticmethod
+    def _month(params):
+        """The month parameter as 1-12, or None when it is not given"""
+        if not params.get('month'):
+            return None
+        try:
+            month = int(params['month'])
+        except ValueError:
+            month = 0
+        if not 1 <= month <= 12:
+            raise ValueError(f"month must be an integer from 1 to 12, got {params['month']!r}")
+        return month
+
+    def _monthly(self, params):
+        month = self._month(params)
+        monthly = cube_stats(build_aggregate_cube(self._select(params)), 'month')
+        if month is not None:
+            if month not in monthly.index:
+                raise ValueError(f"No data for month {month} matches the query parameters")
+            return monthly.loc[month]
+        return monthly.to_dict('index')
+
+    def _regional_std(self, params):
+        return cube_std(build_aggregate_cube(self._select(params)), 'region').sort_values()
+
+    def _seasonal_index(self, params):
+        month = self._month(params)
+        indices = decompose_panel(self._select(params))['seasonal_indices']
+        if month is not None:
+            if month not in indices.columns:
+                raise ValueError(f"No data for month {month} matches the query parameters")
+            return indices[month]
+        return indices.to_dict('index')
+
+    QUERIES = {
+        'stats': _stats,
+        'covid': _covid,
+        'monthly': _monthly,
+        'regional_std': _regional_std,
+        'seasonal_index': _seasonal_index
+    }
+
+    def query(self, name, params):
+        """Answer a named query, from the LRU cache when possible"""
+        if name not in self.QUERIES:
+            raise KeyError(name)
+        self.ensure_fresh()
+        key = (self.version, name, tuple(sorted(params.items())))
+        return self.cache.get_or_compute(key, lambda: main.jsonable(self.QUERIES[name](self, params), 'split'))
+
+    def status(self):
+        return {
+            'data_path': self.data_path,
+            'rows': len(self.df),
+            'data_version': self.version,
+            'cached_results': len(self.cache.entries),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'queries': sorted(self.QUERIES)
+        }
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /<query>?region=West&since=2018-01-01 returns the query result as JSON"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        name = url.path.strip('/') or 'status'
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+        if name != 'status' and name not in service.QUERIES:
+            self._send(404, {'error': f"Unknown query '{name}'", 'queries': sorted(service.QUERIES)})
+            return
+        try:
+            if name == 'status':
+                self._send(200, service.status())
+            else:
+                self._send(200, service.query(name, params))
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception(f"Query {name} failed")
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no host address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class _ThreadPoolMixIn:
+    """Serve each request on a bounded thread pool instead of a thread per request"""
+
+    def __init__(self, *args, workers=8, **kwargs):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+class PooledHTTPServer(_ThreadPoolMixIn, HTTPServer):
+    pass
+
+class PooledUnixHTTPServer(_ThreadPoolMixIn, UnixStreamServer):
+    pass
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None, workers=8):
+    """Create a pooled HTTP server over TCP or a Unix socket"""
+    if unix_socket:
+        # Replace a stale socket left by an earlier server, but never another file
+        if os.path.exists(unix_socket):
+            if not stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                raise FileExistsError(f"{unix_socket} exists and is not a socket")
+            os.unlink(unix_socket)
+        server = PooledUnixHTTPServer(unix_socket, QueryHandler, workers=workers)
+    else:
+        server = PooledHTTPServer((host, port), QueryHandler, workers=workers)
+    server.service = service
+    return server
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Serve unemployment analysis queries from memory')
+    parser.add_argument('--data', default=main.DATA_PATH, help='CSV file with unemployment data')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help='Listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=8, help='Request handling threads')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Query results kept in the LRU cache')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the on-disk stage cache')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Load the CSV in chunks with the declared column types')
+    parser.add_argument('--quiet', action='store_true', help='Only log warnings and errors')
+    return parser.parse_args(argv)
+
+def serve(argv=None):
+    """Load the data once and answer queries until interrupted"""
+    args = parse_args(argv)
+    configure_logging(quiet=args.quiet)
+    configure_rendering(mode='none')
+    # Analysis functions log their findings on every query; keep only the server's messages
+    for name in ('cache', 'pipeline', 'data_loader', 'data_cleaner', 'exploratory_analysis',
+                 'covid_impact', 'seasonal_analysis'):
+        get_logger(name).setLevel(logging.WARNING)
+    pipeline_args = (['--no-cache'] if args.no_cache else []) + (['--streaming'] if args.streaming else [])
+    service = AnalysisService(args.data, args.cache_size, pipeline_args)
+
+    server = make_server(service, args.host, args.port, args.unix, args.workers)
+    address = args.unix or f"http://{args.host}:{server.server_address[1]}"
+    logger.info(f"Serving {', '.join(sorted(service.QUERIES))} on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from seasonal_analysis import decompose_panel
+
+# Months of history behind the trailing baseline each month is compared to
+BASELINE_WINDOW = 12
+# CUSUM allowance and alarm level, in baseline standard deviations
+DRIFT = 0.5
+THRESHOLD = 5.0
+# Floor on the baseline standard deviation (percentage points), so a very
+# smooth history does not turn small moves into alarms
+MIN_SIGMA = 0.1
+# Smallest peak rise over the baseline (percentage points) reported as a shock
+MIN_RISE = 1.0
+# Alarm runs processed per batch when locating peaks and recoveries
+RUN_BATCH = 8192
+
+def _trailing_stats(values, window):
+    """Mean and standard deviation of the previous window months, per position"""
+    n_series, n_periods = values.shape
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((n_series, 1))
+    csum = np.concatenate([zeros, np.cumsum(filled, axis=1)], axis=1)
+    csq = np.concatenate([zeros, np.cumsum(filled ** 2, axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+
+    ends = np.arange(n_periods)
+    starts = np.maximum(ends - window, 0)
+    count = ccount[:, ends] - ccount[:, starts]
+    total = csum[:, ends] - csum[:, starts]
+    squares = csq[:, ends] - csq[:, starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        enough = count >= max(2, window // 2)
+        mean = np.where(enough, total / count, np.nan)
+        variance = (squares - total * mean) / (count - 1)
+        std = np.where(enough, np.sqrt(np.maximum(variance, 0)), np.nan)
+    return mean, std
+
+def cusum_statistic(values, window=BASELINE_WINDOW, drift=DRIFT):
+    """One-sided upper CUSUM of every series against its trailing baseline
+
+    S[t] = max(0, S[t-1] + z[t] - drift) is evaluated without a time loop as
+    C[t] - min(0, min C[..t]) with C the cumulative sum of z - drift.
+    Returns (S, baseline mean, baseline std).
+    """
+    mean, std = _trailing_stats(values, window)
+    with np.errstate(invalid='ignore'):
+        z = (values - mean) / np.maximum(std, MIN_SIGMA)
+    increments = np.where(np.isnan(z), 0.0, z - drift)
+    cumulative = np.cumsum(increments, axis=1)
+    statistic = cumulative - np.minimum(np.minimum.accumulate(cumulative, axis=1), 0.0)
+    return statistic, mean, std
+
+def _locate(observed, adjusted, series, alarm, onset, threshold):
+    """Peak position and first position back at or below threshold for a batch of runs"""
+    n_periods = observed.shape[1]
+    positions = np.arange(n_periods)
+    back_ok = (positions >= alarm[:, None]) & (adjusted[series] <= threshold[:, None])
+    has_back = back_ok.any(axis=1)
+    back = np.where(has_back, back_ok.argmax(axis=1), n_periods)
+
+    rows = observed[series]
+    window = (positions >= onset[:, None]) & (positions < back[:, None]) & ~np.isnan(rows)
+    peak_pos = np.where(window, rows, -np.inf).argmax(axis=1)
+    return peak_pos, back
+
+def detect_shocks(df, value_col='unemployment_rate', group_cols='region', tolerance=0.0,
+                  threshold=THRESHOLD, drift=DRIFT, window=BASELINE_WINDOW, min_rise=MIN_RISE,
+                  decomposition=None):
+    """Find shocks and recoveries in every series of a panel at once
+
+    Each series is deseasonalized with decompose_panel (pass a result of it as
+    decomposition to reuse one) and compared with its trailing baseline. A
+    CUSUM alarm marks a shock; its onset is the month after the statistic
+    last stood at zero, its baseline the trailing mean before the onset. The
+    shock lasts until the first month whose deseasonalized value is back at
+    or below baseline * (1 + tolerance); the peak is the highest observed
+    value in between. Overlapping alarms within one shock are merged.
+
+    Returns one row per shock with series, onset/peak/recovery dates,
+    baseline, peak, rise, pct_increase, months_to_recover (peak to
+    recovery, NaN if never recovered) and shock_months (onset to recovery).
+    """
+    if decomposition is None:
+        decomposition = decompose_panel(df, value_col, group_cols)
+    observed = decomposition['observed']
+    adjusted = observed - np.nan_to_num(decomposition['seasonal'])
+    dates = decomposition['dates']
+    n_periods = observed.shape[1]
+
+    statistic, baseline_mean, _ = cusum_statistic(adjusted, window, drift)
+    alarm = statistic > threshold
+    run_start = alarm & ~np.concatenate([np.zeros((len(alarm), 1), dtype=bool), alarm[:, :-1]], axis=1)
+    positions = np.arange(n_periods)
+    last_zero = np.maximum.accumulate(np.where(statistic <= 0, positions, -1), axis=1)
+
+    series, alarm_pos = np.nonzero(run_start)
+    onset = last_zero[series, alarm_pos] + 1
+    baseline = baseline_mean[series, onset]
+    known = ~np.isnan(baseline)
+    series, alarm_pos, onset, baseline = series[known], alarm_pos[known], onset[known], baseline[known]
+
+    peak_pos = np.empty(len(series), dtype=np.int64)
+    back = np.empty(len(series), dtype=np.int64)
+    for lo in range(0, len(series), RUN_BATCH):
+        batch = slice(lo, lo + RUN_BATCH)
+        peak_pos[batch], back[batch] = _locate(observed, adjusted, series[batch], alarm_pos[batch],
+                                               onset[batch], baseline[batch] * (1 + tolerance))
+
+    # Runs come out ordered by (series, alarm); drop those starting before an
+    # earlier shock of the same series recovered (a running max keyed by series)
+    span = n_periods + 1
+    reach = np.maximum.accumulate(series * span + back)
+    previous_reach = np.concatenate([[-1], reach[:-1]])
+    keep = series * span + onset >= previous_reach
+    peak = observed[series, peak_pos]
+    keep &= peak - baseline >= min_rise
+
+    series, onset, peak_pos, back = series[keep], onset[keep], peak_pos[keep], back[keep]
+    baseline, peak = baseline[keep], peak[keep]
+    recovered = back < n_periods
+    grid = dates.to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct_increase = (peak - baseline) / baseline * 100
+    return pd.DataFrame({
+        'series': np.asarray(decomposition['series'])[series],
+        'onset_date': grid[onset],
+        'peak_date': grid[peak_pos],
+        'baseline': baseline,
+        'peak': peak,
+        'rise': peak - baseline,
+        'pct_increase': pct_increase,
+        'recovery_date': np.where(recovered, grid[np.minimum(back, n_periods - 1)], np.datetime64('NaT')),
+        'months_to_recover': np.where(recovered, back - peak_pos, np.nan),
+        'shock_months': np.where(recovered, back - onset, np.nan)
+    })
+
+def largest_shocks(shocks):
+    """The shock with the largest rise in each series"""
+    if shocks.empty:
+        return shocks
+    order = shocks.sort_values('rise', ascending=False, kind='stable')
+    return order.drop_duplicates('series').sort_values('series').reset_index(drop=True)
+
+def recovery_summary(shocks):
+    """Dashboard figures from the largest shock of every series"""
+    largest = largest_shocks(shocks)
+    recovered = largest['months_to_recover'].dropna()
+    return {
+        'series_with_shock': int(len(largest)),
+        'recovered': int(len(recovered)),
+        'median_months_to_recover': float(recovered.median()) if len(recovered) else np.nan,
+        'median_rise': float(largest['rise'].median()) if len(largest) else np.nan,
+        'median_onset': largest['onset_date'].median() if len(largest) else pd.NaT
+    }
@@ -0,0 +1,196 @@
+import numpy as np
+
+STATS_BACKENDS = ('exact', 'sketch')
+
+# KLL accuracy parameter: k=200 keeps at most a few hundred values and gives a
+# normalized rank error of about 1.7% (99% confidence), regardless of input size
+DEFAULT_K = 200
+# Capacity shrinks by this factor per level below the top compactor
+CAPACITY_DECAY = 2 / 3
+
+def _finite(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return values[~np.isnan(values)]
+
+class MomentAccumulator:
+    """Exact count, mean, variance, min and max in one pass, mergeable across chunks
+
+    Chunks are reduced with NumPy and combined with the parallel update of
+    Chan et al., so the result does not depend on how the data was split.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """Add a chunk of values (NaN is ignored)"""
+        values = _finite(values)
+        if len(values):
+            chunk = MomentAccumulator()
+            chunk.count = len(values)
+            chunk.mean = float(values.mean())
+            chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+            chunk.min = float(values.min())
+            chunk.max = float(values.max())
+            self.merge(chunk)
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator into this one"""
+        count = self.count + other.count
+        if other.count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count = count
+        return self
+
+    def variance(self, ddof=1):
+        return self.m2 / (self.count - ddof) if self.count > ddof else np.nan
+
+    def std(self, ddof=1):
+        return float(np.sqrt(self.variance(ddof)))
+
+    def to_dict(self):
+        return {'count': int(self.count), 'mean': float(self.mean), 'm2': float(self.m2),
+                'min': float(self.min), 'max': float(self.max)}
+
+    @classmethod
+    def from_dict(cls, state):
+        accumulator = cls()
+        accumulator.count = int(state['count'])
+        for key in ('mean', 'm2', 'min', 'max'):
+            setattr(accumulator, key, float(state[key]))
+        return accumulator
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty) with bounded memory
+
+    Values enter the level-0 compactor; a full compactor sorts its values and
+    promotes every other one (random offset) to the next level, where each
+    value stands for twice as many inputs. Sketches built on separate chunks,
+    regions or processes merge level by level into a sketch with the same
+    error bound as one built on all the data.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Compact an even number of values; an odd one out stays behind
+                odd = len(items) % 2
+                self.levels[level] = items[:odd]
+                promoted = items[odd + self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add a chunk of values (NaN is ignored)"""
+        values = _finite(values)
+        if len(values):
+            self.count += len(values)
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile(s); exact (linear interpolation) until the first compaction"""
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        if len(self.levels) == 1:
+            # Nothing compacted yet: every value is still held, so answer exactly
+            result = np.quantile(self.levels[0], q)
+            return float(result) if result.ndim == 0 else result
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2.0 ** level) for level, values in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = items[np.minimum(positions, len(items) - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return float(result) if result.ndim == 0 else result
+
+    def size(self):
+        """Number of values retained"""
+        return sum(len(values) for values in self.levels)
+
+class StreamingSummary:
+    """One-pass summary statistics: exact moments plus a KLL sketch for quantiles"""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.moments = MomentAccumulator()
+        self.sketch = KLLSketch(k, seed)
+
+    def update(self, values):
+        values = _finite(values)
+        self.moments.update(values)
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        """Count, mean, std, min, max and quartiles"""
+        q25, median, q75 = self.quantile([0.25, 0.5, 0.75])
+        return {
+            'count': self.moments.count,
+            'mean': self.moments.mean if self.moments.count else np.nan,
+            'std': self.moments.std(),
+            'min': self.moments.min if self.moments.count else np.nan,
+            'max': self.moments.max if self.moments.count else np.nan,
+            'q25': float(q25),
+            'median': float(median),
+            'q75': float(q75)
+        }
+
+def summarize(values, chunksize=1_000_000, k=DEFAULT_K, seed=None):
+    """StreamingSummary of an array, fed in chunks"""
+    values = np.asarray(values)
+    summary = StreamingSummary(k, seed)
+    for start in range(0, len(values), chunksize):
+        summary.update(values[start:start + chunksize])
+    return summary